@@ -0,0 +1,51 @@
+# config.py
+import os
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import anyio.to_thread
+from dotenv import load_dotenv
+
+# Loaded once per process; every module imports its settings from here
+load_dotenv()
+
+API_KEY = os.getenv("API_KEY")
+OPENAI_API_BASE = os.getenv("OPENAI_API_BASE")
+OPENAI_MODEL_NAME = os.getenv("OPENAI_MODEL_NAME")
+
+# CrewAI/LangChain read their LLM settings from these variables
+if not os.environ.get("OPENAI_API_KEY") and API_KEY:
+    os.environ["OPENAI_API_KEY"] = API_KEY
+if not os.environ.get("OPENAI_API_BASE") and OPENAI_API_BASE:
+    os.environ["OPENAI_API_BASE"] = OPENAI_API_BASE
+if not os.environ.get("OPENAI_MODEL_NAME") and OPENAI_MODEL_NAME:
+    os.environ["OPENAI_MODEL_NAME"] = OPENAI_MODEL_NAME
+
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+
+# Maximum number of evaluations run in parallel (tune against the LLM rate limit)
+EVAL_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "8"))
+
+# Seconds a generated question set is reused for the same resume and role
+QUESTIONS_CACHE_TTL = int(os.getenv("QUESTIONS_CACHE_TTL", "86400"))
+
+# Seconds an idle interview session is kept
+SESSION_TTL = int(os.getenv("SESSION_TTL", "3600"))
+# Sessions kept in each process before the least recently used are dropped
+SESSION_MAX = int(os.getenv("SESSION_MAX", "10000"))
+
+# Optional Redis used to share caches across workers
+REDIS_URL = os.getenv("REDIS_URL")
+
+# Worker threads available for blocking CrewAI/LLM calls
+THREAD_POOL_SIZE = int(os.getenv("THREAD_POOL_SIZE", "100"))
+
+def configure_thread_pools():
+    """
+    Raise the thread limits used for blocking work (call from an app startup hook).
+
+    asyncio.to_thread uses the loop's default executor and Starlette runs sync
+    endpoints through anyio's limiter (40 threads by default); both are sized to
+    THREAD_POOL_SIZE so concurrent requests aren't throttled.
+    """
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=THREAD_POOL_SIZE))
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREAD_POOL_SIZE
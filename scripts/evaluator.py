@@ -1,73 +1,339 @@
 # evaluator.py
-import os
 import re
 import time
-import json
+import orjson
+import sqlite3
+import asyncio
+import threading
+import queue
+import functools
+from collections import OrderedDict, defaultdict
 from crewai import Agent, Task, Crew, Process
-from dotenv import load_dotenv
 from typing import List, Dict, Any, Optional, Tuple
-import hashlib
+import blake3
 from pathlib import Path
+import config
+import llm
+from semantic_cache import SemanticCache, get_default_cache
+
+# Evaluator guidance for each question type
+BACKSTORY_ADDITIONS = {
+    "technical": (
+        "You have deep technical expertise and can judge the accuracy and depth of technical answers. "
+        "You value correct technical explanations, best practices, and evidence of hands-on experience. "
+        "Look for conceptual understanding rather than just terminology."
+    ),
+    "behavioral": (
+        "You excel at assessing past behavior as an indicator of future performance. "
+        "You value the STAR method (Situation, Task, Action, Result) in responses. "
+        "Look for specific examples rather than hypothetical approaches."
+    ),
+    "situational": (
+        "You can evaluate how candidates approach hypothetical scenarios. "
+        "You value thought process, problem-solving methodology, and communication clarity. "
+        "Look for structured approaches to tackling the scenario."
+    ),
+    "background": (
+        "You can assess if a candidate's background aligns with job requirements. "
+        "You value relevant experience, transferable skills, and learning progression. "
+        "Look for evidence of claimed experience rather than just stating technologies."
+    ),
+    "motivation": (
+        "You can detect genuine interest versus rehearsed answers about motivation. "
+        "You value alignment between candidate goals and company/role opportunities. "
+        "Look for specificity about this role rather than generic statements."
+    ),
+    "general": (
+        "You have a balanced approach to evaluating interview responses. "
+        "You value clarity, relevance, and depth in answers. "
+        "Look for both technical accuracy and communication effectiveness."
+    )
+}
+
+# Rating scale shared by every evaluation prompt
+RATING_SCALE = (
+    "0-2: Completely inadequate response (irrelevant, incorrect, or missing key elements)\n"
+    "3-4: Below expectations (partial answer, lacks depth or specificity)\n"
+    "5-6: Meets basic expectations (relevant but lacks some depth or examples)\n"
+    "7-8: Strong response (specific, detailed, demonstrates experience)\n"
+    "9-10: Exceptional response (comprehensive, insightful, demonstrates expertise)\n"
+)
+
+# Rating parsing: a bare 0-10 number, or a descriptive word as a fallback
+SCORE_PATTERN = re.compile(r'\b(10|[0-9])\b')
+COMPLETE_SCORE_PATTERN = re.compile(r'\b(10|[0-9])\b(?=\D)')
+SCORE_KEYWORDS = (
+    ("9", ("excellent", "exceptional", "outstanding", "perfect")),
+    ("7", ("good", "strong", "solid")),
+    ("5", ("adequate", "acceptable", "fair", "average")),
+    ("3", ("poor", "weak", "inadequate")),
+    ("1", ("very poor", "terrible", "completely inadequate"))
+)
+
+# Per-type rating instructions appended to each evaluator agent's backstory
+RATING_CRITERIA = {
+    question_type: f"For this {question_type} question, rate the response on a scale of 0-10 where:\n" + RATING_SCALE
+    for question_type in BACKSTORY_ADDITIONS
+}
+
+# Static system prompt for direct LLM calls. It must stay byte-identical across
+# requests (no interpolation) so the provider's prompt-prefix cache is hit; the
+# role, question type, question and answer all go in the user message.
+EVALUATION_SYSTEM_PROMPT = (
+    "You are an expert interview evaluator with years of experience in technical hiring.\n\n"
+    "Apply the guidance matching the question type you are given:\n"
+    + "".join(f"- {question_type}: {guidance}\n" for question_type, guidance in BACKSTORY_ADDITIONS.items())
+    + "\nRate the response on a scale of 0-10 where:\n"
+    + RATING_SCALE
+)
+
+# Question type keywords, in priority order (the first type with a match wins)
+QUESTION_TYPE_KEYWORDS = {
+    "situational": ["how would you", "what would you do", "imagine"],
+    "behavioral": ["tell me about a time", "describe a situation", "give an example", "can you provide"],
+    "background": ["experience with", "familiar with", "tell me about your experience", "worked on", "built", "developed"],
+    "motivation": ["why", "interested in", "passion", "career goals"],
+    "technical": ["how do you", "explain", "describe the process", "methodology", "approach", "implement", "coding", "programming", "database", "algorithm"]
+}
+QUESTION_TYPES = list(QUESTION_TYPE_KEYWORDS)
+QUESTION_TYPE_PRIORITY = {question_type: i for i, question_type in enumerate(QUESTION_TYPES)}
+
+# Zero-width lookahead so every keyword occurrence is seen, even overlapping ones
+QUESTION_TYPE_PATTERN = re.compile(
+    "(?=" + "|".join(
+        f"(?P<{question_type}>{'|'.join(map(re.escape, keywords))})"
+        for question_type, keywords in QUESTION_TYPE_KEYWORDS.items()
+    ) + ")"
+)
+
+# Answers longer than this are sent as their head and tail only, keeping prompt size flat
+MAX_ANSWER_CHARS = 5000
+ANSWER_EXCERPT_CHARS = 1500
+
+def _truncate_answer(answer: str) -> str:
+    """Shorten very long answers to their first and last ANSWER_EXCERPT_CHARS characters."""
+    if len(answer) <= MAX_ANSWER_CHARS:
+        return answer
+    return f"{answer[:ANSWER_EXCERPT_CHARS]}\n[...]\n{answer[-ANSWER_EXCERPT_CHARS:]}"
+
+# Bytes of the SQLite cache file memory-mapped for reads
+CACHE_MMAP_SIZE = 256 * 1024 * 1024
+
+# Entries kept in each evaluator's in-process cache before the oldest is evicted
+MEMORY_CACHE_SIZE = 1024
+
+# One SQLite connection per process, shared by every evaluator and the writer thread
+CACHE_DB_PATH = Path("./cache") / "evals.sqlite"
+_cache_db: Optional[sqlite3.Connection] = None
+_cache_db_lock = threading.Lock()
+
+def _get_cache_db() -> sqlite3.Connection:
+    """Open the evaluation cache database on first use."""
+    global _cache_db
+    with _cache_db_lock:
+        if _cache_db is None:
+            CACHE_DB_PATH.parent.mkdir(exist_ok=True)
+            db = sqlite3.connect(str(CACHE_DB_PATH), check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            # Serve reads from a memory map of the database file instead of read() syscalls
+            db.execute(f"PRAGMA mmap_size={CACHE_MMAP_SIZE}")
+            db.execute("CREATE TABLE IF NOT EXISTS evals (key TEXT PRIMARY KEY, json BLOB, ts REAL)")
+            db.commit()
+            _cache_db = db
+        return _cache_db
+
+def _read_cached_row(cache_key: str) -> Optional[bytes]:
+    """Return the stored JSON for a cache key, or None."""
+    db = _get_cache_db()
+    with _cache_db_lock:
+        row = db.execute("SELECT json FROM evals WHERE key = ?", (cache_key,)).fetchone()
+    return row[0] if row else None
+
+# Cache writes are persisted by a background thread so evaluations return
+# as soon as the in-process cache is updated
+_cache_writes: "queue.Queue[Tuple[str, bytes, float]]" = queue.Queue()
+_cache_writer: Optional[threading.Thread] = None
+_cache_writer_lock = threading.Lock()
+
+def _run_cache_writer() -> None:
+    """Drain queued cache writes into the SQLite database."""
+    while True:
+        cache_key, payload, timestamp = _cache_writes.get()
+        try:
+            db = _get_cache_db()
+            with _cache_db_lock:
+                db.execute(
+                    "INSERT OR REPLACE INTO evals (key, json, ts) VALUES (?, ?, ?)",
+                    (cache_key, payload, timestamp)
+                )
+                db.commit()
+        except Exception as e:
+            print(f"Warning: Failed to save evaluation to cache: {e}")
+        finally:
+            _cache_writes.task_done()
+
+def _ensure_cache_writer() -> None:
+    global _cache_writer
+    with _cache_writer_lock:
+        if _cache_writer is None:
+            _cache_writer = threading.Thread(target=_run_cache_writer, name="evaluation-cache-writer", daemon=True)
+            _cache_writer.start()
+
+def flush_cache_writes() -> None:
+    """Block until every queued cache write is on disk, then close the database (call on application shutdown)."""
+    global _cache_db
+    _cache_writes.join()
+    with _cache_db_lock:
+        if _cache_db is not None:
+            _cache_db.close()
+            _cache_db = None
 
 class InterviewEvaluator:
-    def __init__(self, role: str = None, resume_data: Dict = None):
+    def __init__(self, role: str = None, resume_data: Dict = None, max_concurrency: int = None,
+                 semantic_cache: Optional[SemanticCache] = None):
         """
         Initialize the evaluator with optional context about the candidate and role.
         
         Args:
             role: The job role being applied for
             resume_data: Extracted resume data containing skills, experience, etc.
+            max_concurrency: Maximum number of evaluations run in parallel by
+                evaluate_all_responses (defaults to EVAL_CONCURRENCY)
+            semantic_cache: Similarity cache for near-duplicate answers
+                (defaults to the shared process-wide cache)
         """
-        load_dotenv()
-        self.api_key = os.getenv("API_KEY")
-        self.api_base = os.getenv("OPENAI_API_BASE")
-        self.api_model_name = os.getenv("OPENAI_MODEL_NAME")
-
-        os.environ["OPENAI_API_BASE"] = self.api_base
-        os.environ["OPENAI_MODEL_NAME"] = self.api_model_name
-        os.environ["OPENAI_API_KEY"] = self.api_key
+        self.api_key = config.OPENAI_API_KEY
+        self.api_base = config.OPENAI_API_BASE
+        self.api_model_name = config.OPENAI_MODEL_NAME
         
         # Store role and resume data for contextual evaluation
         self.role = role
         self.resume_data = resume_data
+
+        # Resume-derived context doesn't change between questions, so prepare it once
+        self._skill_terms: List[Tuple[str, List[str]]] = []
+        self._experience_level = "entry"  # Default
+        if isinstance(self.resume_data, dict):
+            if "skills" in self.resume_data and self.resume_data["skills"]:
+                self._skill_terms = [
+                    (skill, skill.split())
+                    for skill in (s.strip() for s in self.resume_data["skills"].lower().split("\n"))
+                    if skill
+                ]
+            
+            # Determine experience level
+            if "years_of_experience" in self.resume_data:
+                years = self.resume_data["years_of_experience"]
+                if years < 2:
+                    self._experience_level = "entry"
+                elif years < 5:
+                    self._experience_level = "mid"
+                else:
+                    self._experience_level = "senior"
+
+        # Ratings depend on who is being evaluated, so cached scores are scoped to role and level
+        self._cache_scope = f"{self.role or ''}|{self._experience_level}"
         
-        # Cache to store evaluation results and reduce API calls
-        self._cache_dir = Path("./cache")
-        self._cache_dir.mkdir(exist_ok=True)
+        # Evaluation results persist in the process-wide SQLite cache (see _get_cache_db);
+        # this in-process LRU sits in front of it for repeats within a session
+        self._mem_cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        # Second-tier cache that also matches near-duplicate question-answer pairs
+        self._semantic_cache = semantic_cache or get_default_cache()
+        
+        # Evaluator agents keyed by (question_type, role); built once and reused across calls
+        self._agents: Dict[Tuple[str, str], Agent] = {}
+
+        # Crews around those agents, each with a lock since a crew runs one task at a time
+        self._crews: Dict[Tuple[str, str], Tuple[Crew, threading.Lock]] = {}
         
         # Evaluation history to track overall performance
         self.evaluation_history = []
 
+        # Running totals so statistics don't rescan the history
+        self._score_sum = 0.0
+        self._score_count = 0
+        self._score_min = None
+        self._score_max = None
+        self._type_sum: Dict[str, List] = defaultdict(lambda: [0.0, 0])
+
+        # Upper bound on concurrent LLM calls when evaluating in bulk
+        self.max_concurrency = max_concurrency or config.EVAL_CONCURRENCY
+
     def _get_cache_key(self, question: str, answer: str) -> str:
         """Generate a unique cache key for a question-answer pair."""
-        content = f"{question.strip().lower()}|{answer.strip().lower()}"
-        return hashlib.md5(content.encode()).hexdigest()
+        # Hash the normalised parts incrementally instead of building one joined string
+        key_hash = blake3.blake3(self._cache_scope.lower().encode())
+        key_hash.update(b"|")
+        key_hash.update(question.strip().lower().encode())
+        key_hash.update(b"|")
+        key_hash.update(answer.strip().lower().encode())
+        return key_hash.hexdigest(16)
 
     def _get_cached_evaluation(self, question: str, answer: str) -> Optional[Dict]:
         """Try to retrieve a cached evaluation result."""
         cache_key = self._get_cache_key(question, answer)
-        cache_file = self._cache_dir / f"{cache_key}.json"
-        
-        if cache_file.exists():
-            try:
-                with open(cache_file, "r") as f:
-                    return json.load(f)
-            except Exception:
+        evaluation = self._get_remembered(cache_key)
+        if evaluation is not None:
+            return evaluation
+        return self._load_cached_evaluation(cache_key)
+
+    async def _get_cached_evaluation_async(self, question: str, answer: str) -> Optional[Dict]:
+        """Like _get_cached_evaluation, but reads SQLite in a worker thread."""
+        cache_key = self._get_cache_key(question, answer)
+        evaluation = self._get_remembered(cache_key)
+        if evaluation is not None:
+            return evaluation
+        return await asyncio.to_thread(self._load_cached_evaluation, cache_key)
+
+    def _get_cached_evaluations(self, responses: List[Dict]) -> List[Optional[Dict]]:
+        """Look up every question-answer pair (run in a worker thread by the bulk paths)."""
+        return [self._get_cached_evaluation(r["question"], r["answer"]) for r in responses]
+
+    def _get_remembered(self, cache_key: str) -> Optional[Dict]:
+        """Return an evaluation from the in-process LRU, or None."""
+        with self._cache_lock:
+            evaluation = self._mem_cache.get(cache_key)
+            if evaluation is not None:
+                self._mem_cache.move_to_end(cache_key)
+            return evaluation
+
+    def _load_cached_evaluation(self, cache_key: str) -> Optional[Dict]:
+        """Read an evaluation from SQLite and keep it in the in-process LRU."""
+        try:
+            payload = _read_cached_row(cache_key)
+            if payload is None:
                 return None
-        return None
+            evaluation = orjson.loads(payload)
+        except Exception:
+            return None
+
+        with self._cache_lock:
+            self._remember(cache_key, evaluation)
+        return evaluation
 
     def _save_to_cache(self, question: str, answer: str, evaluation: Dict) -> None:
         """Save evaluation result to cache."""
         cache_key = self._get_cache_key(question, answer)
-        cache_file = self._cache_dir / f"{cache_key}.json"
         
-        try:
-            with open(cache_file, "w") as f:
-                json.dump(evaluation, f)
-        except Exception as e:
-            print(f"Warning: Failed to save evaluation to cache: {e}")
+        with self._cache_lock:
+            self._remember(cache_key, evaluation)
 
-    def evaluate_response(self, question: str, answer: str, job_context: Optional[Dict] = None) -> str:
+        # Persisted off the request path by the cache writer thread
+        _ensure_cache_writer()
+        _cache_writes.put((cache_key, orjson.dumps(evaluation), time.time()))
+
+    def _remember(self, cache_key: str, evaluation: Dict) -> None:
+        """Add an evaluation to the in-process LRU (caller holds _cache_lock)."""
+        self._mem_cache[cache_key] = evaluation
+        self._mem_cache.move_to_end(cache_key)
+        if len(self._mem_cache) > MEMORY_CACHE_SIZE:
+            self._mem_cache.popitem(last=False)
+
+    def evaluate_response(self, question: str, answer: str, job_context: Optional[Dict] = None,
+                          question_type: Optional[str] = None) -> int:
         """
         Evaluate a single question-answer pair using CrewAI.
         
@@ -75,23 +341,38 @@ class InterviewEvaluator:
             question: The interview question asked
             answer: The candidate's response
             job_context: Optional additional context about the job/interview
+            question_type: Question type if the caller has already classified it
             
         Returns:
-            Evaluation result (numerical score)
+            Evaluation result (integer score from 0-10)
         """
         # Check cache first
         cached_result = self._get_cached_evaluation(question, answer)
         if cached_result:
-            return cached_result["score"]
+            return int(cached_result["score"])
+
+        # Degenerate answers are scored without an LLM call
+        trivial_score = self._score_trivial_answer(question, answer)
+        if trivial_score is not None:
+            self._record_evaluation(question, answer, trivial_score,
+                                    question_type or self._analyze_question_type(question), 0.0, cache=False)
+            return trivial_score
+
+        # Then look for a near-duplicate evaluation
+        embedding = None
+        if self._semantic_cache:
+            cached_score, embedding = self._semantic_cache.lookup(question, answer, self._cache_scope)
+            if cached_score is not None:
+                return cached_score
             
         # Prepare context information
         context = self._prepare_evaluation_context(question, job_context)
         
         # Analyze question type to tailor evaluation
-        question_type = self._analyze_question_type(question)
+        question_type = question_type or self._analyze_question_type(question)
         
-        # Create specialized evaluator agent based on question type
-        evaluator_agent = self._create_evaluator_agent(question, answer, question_type, context)
+        # Reuse the specialized evaluator agent for this question type
+        evaluator_agent = self._get_evaluator_agent(question_type, context)
 
         evaluation_task = Task(
             description=self._create_task_description(question, answer, question_type, context),
@@ -99,177 +380,252 @@ class InterviewEvaluator:
             expected_output="A numerical rating from 0-10, with only the number as the output."
         )
 
-        evaluation_crew = Crew(
-            agents=[evaluator_agent],
-            tasks=[evaluation_task],
-            verbose=0,
-            process=Process.sequential
-        )
+        evaluation_crew, crew_lock = self._get_evaluator_crew(question_type, context, evaluation_task)
+
+        # Execute evaluation (transient LLM errors are retried with backoff)
+        try:
+            start_time = time.time()
+            with crew_lock:
+                evaluation_crew.tasks = [evaluation_task]
+                raw_result = llm.kickoff_with_retry(evaluation_crew)
+            elapsed_time = time.time() - start_time
+            
+            # Extract just the numerical score
+            score = int(self._extract_score(raw_result))
+            self._record_evaluation(question, answer, score, question_type, elapsed_time, embedding)
+            
+            return score
+        except Exception as e:
+            print(f"Error during evaluation: {e}")
+            return 5  # Default middle score in case of error
+
+    async def evaluate_response_async(self, question: str, answer: str, job_context: Optional[Dict] = None,
+                                      question_type: Optional[str] = None) -> int:
+        """
+        Evaluate a single question-answer pair with a streamed LLM completion.
+
+        Bypasses CrewAI's blocking kickoff: the evaluator backstory and task are
+        sent straight to the model and the stream is closed as soon as a
+        complete rating has been emitted.
+        
+        Args:
+            question: The interview question asked
+            answer: The candidate's response
+            job_context: Optional additional context about the job/interview
+            question_type: Question type if the caller has already classified it
+            
+        Returns:
+            Evaluation result (integer score from 0-10)
+        """
+        # Check cache first (off the event loop)
+        cached_result = await self._get_cached_evaluation_async(question, answer)
+        if cached_result:
+            return int(cached_result["score"])
+
+        # Degenerate answers are scored without an LLM call
+        trivial_score = self._score_trivial_answer(question, answer)
+        if trivial_score is not None:
+            self._record_evaluation(question, answer, trivial_score,
+                                    question_type or self._analyze_question_type(question), 0.0, cache=False)
+            return trivial_score
+
+        # Then look for a near-duplicate evaluation (embedding is a blocking API call)
+        embedding = None
+        if self._semantic_cache:
+            cached_score, embedding = await asyncio.to_thread(
+                self._semantic_cache.lookup, question, answer, self._cache_scope
+            )
+            if cached_score is not None:
+                return cached_score
+
+        context = self._prepare_evaluation_context(question, job_context)
+        question_type = question_type or self._analyze_question_type(question)
+        messages = [
+            {"role": "system", "content": EVALUATION_SYSTEM_PROMPT},
+            {"role": "user", "content": self._create_task_description(question, answer, question_type, context)}
+        ]
 
-        # Execute evaluation
         try:
-            # Add retry logic
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    start_time = time.time()
-                    raw_result = evaluation_crew.kickoff()
-                    elapsed_time = time.time() - start_time
-                    
-                    # Extract just the numerical score
-                    score = self._extract_score(raw_result)
-                    
-                    # Store evaluation metadata
-                    eval_result = {
-                        "score": score,
-                        "question_type": question_type,
-                        "timestamp": time.time(),
-                        "processing_time": elapsed_time
-                    }
-                    
-                    # Cache the result
-                    self._save_to_cache(question, answer, eval_result)
-                    
-                    # Add to history
-                    self.evaluation_history.append({
-                        "question": question,
-                        "answer": answer,
-                        "evaluation": score,
-                        "question_type": question_type
-                    })
-                    
-                    return score
-                except Exception as e:
-                    if attempt < max_retries - 1:
-                        print(f"Evaluation attempt {attempt+1} failed: {e}. Retrying...")
-                        time.sleep(2)  # Short delay before retry
-                    else:
-                        raise e
+            start_time = time.time()
+            raw_result = await self._stream_rating(messages)
+            elapsed_time = time.time() - start_time
+
+            score = int(self._extract_score(raw_result))
+            self._record_evaluation(question, answer, score, question_type, elapsed_time, embedding)
+
+            return score
         except Exception as e:
             print(f"Error during evaluation: {e}")
-            return "5"  # Default middle score in case of error
+            return 5  # Default middle score in case of error
+
+    @llm.llm_retry
+    async def _stream_rating(self, messages: List[Dict[str, str]]) -> str:
+        """Stream the evaluation completion, stopping once a whole rating has arrived."""
+        text = ""
+        # The reply is only a rating, so cap it to a few deterministic tokens
+        stream = llm.stream_chat(messages, max_tokens=3, temperature=0, stop=["\n"])
+        try:
+            async for chunk in stream:
+                text += chunk
+                # A rating is complete once the number is followed by another character
+                if COMPLETE_SCORE_PATTERN.search(text):
+                    break
+        finally:
+            await stream.aclose()
+        return text
+
+    @staticmethod
+    def _score_trivial_answer(question: str, answer: str) -> Optional[int]:
+        """Return a fixed score for empty, one- or two-word, or parroted answers, else None."""
+        stripped = answer.strip()
+        if len(stripped) < 5:
+            return 0
+        if stripped.lower() == question.strip().lower():
+            return 0
+        if len(stripped.split()) < 3:
+            return 1
+        return None
+
+    def _record_evaluation(self, question: str, answer: str, score: int, question_type: str,
+                           elapsed_time: float, embedding=None, cache: bool = True) -> None:
+        """Cache a fresh evaluation (unless cache is False) and add it to the history."""
+        if cache:
+            self._cache_evaluation(question, answer, score, question_type, elapsed_time, embedding)
+        
+        # Add to history
+        self.evaluation_history.append({
+            "question": question,
+            "answer": answer,
+            "evaluation": score,
+            "question_type": question_type
+        })
+
+        value = float(score)
+        self._score_sum += value
+        self._score_count += 1
+        self._score_min = value if self._score_min is None else min(self._score_min, value)
+        self._score_max = value if self._score_max is None else max(self._score_max, value)
+        type_totals = self._type_sum[question_type]
+        type_totals[0] += value
+        type_totals[1] += 1
+
+    def _cache_evaluation(self, question: str, answer: str, score: int, question_type: str,
+                          elapsed_time: float, embedding=None) -> None:
+        """Save an evaluation to the result cache and the semantic cache."""
+        eval_result = {
+            "score": score,
+            "question_type": question_type,
+            "timestamp": time.time(),
+            "processing_time": elapsed_time
+        }
+        self._save_to_cache(question, answer, eval_result)
+        if self._semantic_cache:
+            # Embeds the answer when no embedding is given, which is a blocking API call
+            self._semantic_cache.insert(question, answer, score, embedding, self._cache_scope)
 
-    def _analyze_question_type(self, question: str) -> str:
+    def _cache_evaluations(self, evaluations: List[Tuple[str, str, int, str, float]]) -> None:
+        """Cache several (question, answer, score, question_type, elapsed_time) evaluations."""
+        for evaluation in evaluations:
+            self._cache_evaluation(*evaluation)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=512)
+    def _analyze_question_type(question: str) -> str:
         """
         Analyze the type of question to apply appropriate evaluation criteria.
+        Memoized, since the same question is classified on every evaluation path.
         
         Returns one of: technical, behavioral, situational, background, motivation
         """
-        question_lower = question.lower()
-        
-        if any(kw in question_lower for kw in ["how would you", "what would you do", "imagine"]):
-            return "situational"
-        elif any(kw in question_lower for kw in ["tell me about a time", "describe a situation", "give an example", "can you provide"]):
-            return "behavioral"
-        elif any(kw in question_lower for kw in ["experience with", "familiar with", "tell me about your experience", "worked on", "built", "developed"]):
-            return "background"
-        elif any(kw in question_lower for kw in ["why", "interested in", "passion", "career goals"]):
-            return "motivation"
-        elif any(kw in question_lower for kw in ["how do you", "explain", "describe the process", "methodology", "approach", "implement", "coding", "programming", "database", "algorithm"]):
-            return "technical"
-        else:
-            return "general"
+        # One pass over the question; the highest-priority type matched anywhere wins
+        best = None
+        for match in QUESTION_TYPE_PATTERN.finditer(question.lower()):
+            priority = QUESTION_TYPE_PRIORITY[match.lastgroup]
+            if best is None or priority < best:
+                best = priority
+                if best == 0:
+                    break
+        return QUESTION_TYPES[best] if best is not None else "general"
 
     def _prepare_evaluation_context(self, question: str, job_context: Optional[Dict] = None) -> Dict:
         """Prepare context information for better evaluation."""
         context = {
             "role": self.role or (job_context.get("role") if job_context else None),
             "skills": [],
-            "experience_level": "entry"  # Default
+            "experience_level": self._experience_level
         }
         
-        # Include resume data if available
-        if self.resume_data:
-            if "skills" in self.resume_data and self.resume_data["skills"]:
-                # Extract key skills relevant to the question
-                all_skills = self.resume_data["skills"].lower().split("\n")
-                question_lower = question.lower()
-                
-                # Find skills mentioned in the question
-                relevant_skills = [
-                    skill for skill in all_skills 
-                    if any(term in question_lower for term in skill.split())
-                ]
-                
-                context["skills"] = relevant_skills
-            
-            # Determine experience level
-            if "years_of_experience" in self.resume_data:
-                years = self.resume_data["years_of_experience"]
-                if years < 2:
-                    context["experience_level"] = "entry"
-                elif years < 5:
-                    context["experience_level"] = "mid"
-                else:
-                    context["experience_level"] = "senior"
+        # Find resume skills mentioned in the question
+        if self._skill_terms:
+            question_lower = question.lower()
+            context["skills"] = [
+                skill for skill, terms in self._skill_terms
+                if any(term in question_lower for term in terms)
+            ]
         
         return context
 
-    def _create_evaluator_agent(self, question: str, answer: str, question_type: str, context: Dict) -> Agent:
-        """Create specialized evaluator agent based on question type."""
-        backstory_base = (
-            "You are an expert interview evaluator with years of experience in technical hiring. "
-            f"You're evaluating a candidate for a {context['role'] or 'technical'} position. "
-        )
-        
-        backstory_additions = {
-            "technical": (
-                "You have deep technical expertise and can judge the accuracy and depth of technical answers. "
-                "You value correct technical explanations, best practices, and evidence of hands-on experience. "
-                "Look for conceptual understanding rather than just terminology."
-            ),
-            "behavioral": (
-                "You excel at assessing past behavior as an indicator of future performance. "
-                "You value the STAR method (Situation, Task, Action, Result) in responses. "
-                "Look for specific examples rather than hypothetical approaches."
-            ),
-            "situational": (
-                "You can evaluate how candidates approach hypothetical scenarios. "
-                "You value thought process, problem-solving methodology, and communication clarity. "
-                "Look for structured approaches to tackling the scenario."
-            ),
-            "background": (
-                "You can assess if a candidate's background aligns with job requirements. "
-                "You value relevant experience, transferable skills, and learning progression. "
-                "Look for evidence of claimed experience rather than just stating technologies."
-            ),
-            "motivation": (
-                "You can detect genuine interest versus rehearsed answers about motivation. "
-                "You value alignment between candidate goals and company/role opportunities. "
-                "Look for specificity about this role rather than generic statements."
-            ),
-            "general": (
-                "You have a balanced approach to evaluating interview responses. "
-                "You value clarity, relevance, and depth in answers. "
-                "Look for both technical accuracy and communication effectiveness."
+    def _get_evaluator_agent(self, question_type: str, context: Dict) -> Agent:
+        """
+        Return the evaluator agent for a question type, creating it on first use.
+
+        The agent only depends on the question type and role, so a single
+        instance serves every question of that type. Tasks stay per-call
+        since they carry the question and answer.
+        """
+        key = (question_type, context["role"] or "")
+        agent = self._agents.get(key)
+        if agent is None:
+            agent = self._create_evaluator_agent(question_type, context)
+            self._agents[key] = agent
+        return agent
+
+    def _get_evaluator_crew(self, question_type: str, context: Dict, task: Task) -> Tuple[Crew, threading.Lock]:
+        """
+        Return the crew for a question type and its lock, creating it on first use.
+
+        Callers swap in their own task while holding the lock. CrewAI 0.28 formats
+        kickoff inputs into the task in place, so a shared templated task can't be
+        reused and only the Crew (validation, cache handler setup) is amortized.
+        """
+        key = (question_type, context["role"] or "")
+        entry = self._crews.get(key)
+        if entry is None:
+            crew = Crew(
+                agents=[self._get_evaluator_agent(question_type, context)],
+                tasks=[task],
+                verbose=0,
+                process=Process.sequential
             )
-        }
-        
-        rating_criteria = (
-            f"For this {question_type} question, rate the response on a scale of 0-10 where:\n"
-            "0-2: Completely inadequate response (irrelevant, incorrect, or missing key elements)\n"
-            "3-4: Below expectations (partial answer, lacks depth or specificity)\n"
-            "5-6: Meets basic expectations (relevant but lacks some depth or examples)\n"
-            "7-8: Strong response (specific, detailed, demonstrates experience)\n"
-            "9-10: Exceptional response (comprehensive, insightful, demonstrates expertise)\n"
-        )
-        
-        backstory = backstory_base + backstory_additions[question_type] + rating_criteria
-        
+            entry = self._crews.setdefault(key, (crew, threading.Lock()))
+        return entry
+
+    def _create_evaluator_agent(self, question_type: str, context: Dict) -> Agent:
+        """Create specialized evaluator agent based on question type."""
         return Agent(
             role=f"{question_type.title()} Interview Evaluator",
             goal="Provide an accurate, fair assessment of the candidate's response",
-            backstory=backstory,
+            backstory=self._create_evaluator_backstory(question_type, context),
+            llm=llm.get_chat_model(temperature=0),
             verbose=False,
             allow_delegation=False
         )
 
+    def _create_evaluator_backstory(self, question_type: str, context: Dict) -> str:
+        """Create the evaluator persona and rating criteria for a question type."""
+        backstory_base = (
+            "You are an expert interview evaluator with years of experience in technical hiring. "
+            f"You're evaluating a candidate for a {context['role'] or 'technical'} position. "
+        )
+        
+        return backstory_base + BACKSTORY_ADDITIONS[question_type] + RATING_CRITERIA[question_type]
+
     def _create_task_description(self, question: str, answer: str, question_type: str, context: Dict) -> str:
         """Create a detailed task description for evaluation."""
         task_base = (
             f"Evaluate this {context['experience_level']} level candidate response to a {question_type} question.\n\n"
             f"Question: {question}\n\n"
-            f"Candidate response: \"{answer}\"\n\n"
+            f"Candidate response: \"{_truncate_answer(answer)}\"\n\n"
         )
         
         # Add role-specific context if available
@@ -295,53 +651,291 @@ class InterviewEvaluator:
     def _extract_score(self, raw_result: str) -> str:
         """Extract just the numerical score from the evaluation result."""
         # First try to extract just a number
-        number_match = re.search(r'\b([0-9]|10)\b', raw_result)
+        number_match = SCORE_PATTERN.search(raw_result)
         if number_match:
             return number_match.group(1)
         
         # If that fails, try to interpret the response
         result_lower = raw_result.lower()
         
-        if any(term in result_lower for term in ["excellent", "exceptional", "outstanding", "perfect"]):
-            return "9"
-        elif any(term in result_lower for term in ["good", "strong", "solid"]):
-            return "7"
-        elif any(term in result_lower for term in ["adequate", "acceptable", "fair", "average"]):
-            return "5"
-        elif any(term in result_lower for term in ["poor", "weak", "inadequate"]):
-            return "3"
-        elif any(term in result_lower for term in ["very poor", "terrible", "completely inadequate"]):
-            return "1"
+        for score, terms in SCORE_KEYWORDS:
+            if any(term in result_lower for term in terms):
+                return score
         
         # Default to middle score if we can't determine
         return "5"
 
-    def evaluate_all_responses(self, responses: List[Dict], job_context: Optional[Dict] = None) -> List[Dict]:
+    async def evaluate_all_responses(self, responses: List[Dict], job_context: Optional[Dict] = None,
+                                     use_batch_api: bool = False) -> List[Dict]:
         """
-        Evaluate all responses from the interview.
+        Evaluate all responses from the interview concurrently.
         
         Args:
             responses: List of dictionaries with 'question' and 'answer' keys
             job_context: Optional job context information
+            use_batch_api: Submit through the provider's Batch API instead (cheaper,
+                but can take hours - for offline grading only)
             
         Returns:
-            List of dictionaries with evaluations added
+            List of dictionaries with evaluations added, in the same order as responses
         """
+        if use_batch_api:
+            return await self.evaluate_all_responses_batch(responses, job_context)
+
+        # Serve cached pairs directly; everything else is rated in one batched call
+        scores: List[Optional[int]] = []
+        pending = []
+        cached_results = await asyncio.to_thread(self._get_cached_evaluations, responses)
+        for i, (response, cached_result) in enumerate(zip(responses, cached_results)):
+            if cached_result:
+                scores.append(int(cached_result["score"]))
+                continue
+            # Degenerate answers are scored (and recorded, as in evaluate_response) without an LLM call
+            trivial_score = self._score_trivial_answer(response["question"], response["answer"])
+            if trivial_score is not None:
+                self._record_evaluation(response["question"], response["answer"], trivial_score,
+                                        self._analyze_question_type(response["question"]), 0.0, cache=False)
+            scores.append(trivial_score)
+            if trivial_score is None:
+                pending.append(i)
+
+        if len(pending) > 1:
+            batch_scores = await self._evaluate_batch([responses[i] for i in pending], job_context)
+            if batch_scores is not None:
+                for i, score in zip(pending, batch_scores):
+                    scores[i] = score
+                pending = []
+
+        # Fall back to one concurrent call per remaining pair
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def sem_eval(response: Dict) -> int:
+            async with semaphore:
+                return await self.evaluate_response_async(
+                    response["question"],
+                    response["answer"],
+                    job_context
+                )
+
+        # One failed evaluation must not cancel the others
+        tasks = [sem_eval(responses[i]) for i in pending]
+        for i, score in zip(pending, await asyncio.gather(*tasks, return_exceptions=True)):
+            if isinstance(score, Exception):
+                print(f"Error during evaluation: {score}")
+                score = 5  # Default middle score in case of error
+            scores[i] = score
+
         evaluations = []
-        for response in responses:
-            evaluation = {
+        for response, score in zip(responses, scores):
+            evaluations.append({
                 "question": response["question"],
                 "answer": response["answer"],
-                "evaluation": self.evaluate_response(
-                    response["question"], 
-                    response["answer"],
-                    job_context
-                ),
+                "evaluation": score,
                 "question_type": self._analyze_question_type(response["question"])
-            }
-            evaluations.append(evaluation)
+            })
         return evaluations
 
+    async def evaluate_all_responses_batch(self, responses: List[Dict], job_context: Optional[Dict] = None,
+                                           poll_interval: float = 5.0, max_poll_interval: float = 300.0) -> List[Dict]:
+        """
+        Evaluate all responses through the provider's Batch API.
+
+        Batch requests cost about half as much as synchronous calls but complete
+        within a 24h window, so this suits post-hoc grading pipelines rather than
+        the interactive interview flow.
+        
+        Args:
+            responses: List of dictionaries with 'question' and 'answer' keys
+            job_context: Optional job context information
+            poll_interval: Initial delay in seconds between batch status checks
+            max_poll_interval: Upper bound for the exponential polling backoff
+            
+        Returns:
+            List of dictionaries with evaluations added, in the same order as responses
+        """
+        client = llm.get_async_client()
+        question_types = [self._analyze_question_type(r["question"]) for r in responses]
+
+        # Cached pairs don't need to be submitted
+        scores: List[Optional[int]] = []
+        lines = []
+        cached_results = await asyncio.to_thread(self._get_cached_evaluations, responses)
+        for i, (response, question_type, cached_result) in enumerate(zip(responses, question_types, cached_results)):
+            if cached_result:
+                scores.append(int(cached_result["score"]))
+                continue
+            trivial_score = self._score_trivial_answer(response["question"], response["answer"])
+            if trivial_score is not None:
+                self._record_evaluation(response["question"], response["answer"], trivial_score,
+                                        question_type, 0.0, cache=False)
+                scores.append(trivial_score)
+                continue
+
+            scores.append(None)
+            context = self._prepare_evaluation_context(response["question"], job_context)
+            lines.append(orjson.dumps({
+                "custom_id": f"q{i}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": config.OPENAI_MODEL_NAME,
+                    "messages": [
+                        {"role": "system", "content": EVALUATION_SYSTEM_PROMPT},
+                        {"role": "user", "content": self._create_task_description(
+                            response["question"], response["answer"], question_type, context
+                        )}
+                    ],
+                    "max_tokens": 3,
+                    "temperature": 0
+                }
+            }))
+
+        if lines:
+            batch_file = await client.files.create(
+                file=("evaluations.jsonl", b"\n".join(lines)),
+                purpose="batch"
+            )
+            batch = await client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+
+            # Poll with exponential backoff until the batch reaches a final state
+            delay = poll_interval
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_poll_interval)
+                batch = await client.batches.retrieve(batch.id)
+
+            if batch.status != "completed" or not batch.output_file_id:
+                raise RuntimeError(f"Evaluation batch {batch.id} ended with status '{batch.status}'")
+
+            output = await client.files.content(batch.output_file_id)
+            raw_results = {}
+            for line in output.content.splitlines():
+                if not line.strip():
+                    continue
+                item = orjson.loads(line)
+                choices = ((item.get("response") or {}).get("body") or {}).get("choices") or []
+                if choices:
+                    raw_results[item["custom_id"]] = choices[0]["message"]["content"] or ""
+
+            evaluations = []
+            for i, (response, question_type) in enumerate(zip(responses, question_types)):
+                if scores[i] is not None:
+                    continue
+                raw_result = raw_results.get(f"q{i}")
+                if raw_result is None:
+                    # The placeholder is returned to the caller but never cached or counted in the statistics
+                    print(f"Warning: No batch result for question {i} in batch {batch.id}, "
+                          "reporting default score 5 (not recorded)")
+                    scores[i] = 5
+                    continue
+                scores[i] = int(self._extract_score(raw_result))
+                evaluations.append((response["question"], response["answer"], scores[i], question_type, 0.0))
+
+            # Caching embeds each answer, so keep those calls off the event loop
+            await asyncio.to_thread(self._cache_evaluations, evaluations)
+            for evaluation in evaluations:
+                self._record_evaluation(*evaluation, cache=False)
+
+        return [
+            {
+                "question": response["question"],
+                "answer": response["answer"],
+                "evaluation": score,
+                "question_type": question_type
+            }
+            for response, score, question_type in zip(responses, scores, question_types)
+        ]
+
+    async def _evaluate_batch(self, responses: List[Dict], job_context: Optional[Dict] = None) -> Optional[List[int]]:
+        """
+        Rate several question-answer pairs with a single LLM call.
+
+        The evaluator backstory is sent once and the model returns a JSON array
+        of ratings, instead of paying one prefill per question.
+        
+        Returns:
+            Scores in the same order as responses, or None if the reply couldn't be parsed
+        """
+        context = self._prepare_evaluation_context("", job_context)
+        pairs = [
+            {
+                "index": i,
+                "question_type": self._analyze_question_type(r["question"]),
+                "question": r["question"],
+                "answer": _truncate_answer(r["answer"])
+            }
+            for i, r in enumerate(responses)
+        ]
+        messages = [
+            {"role": "system", "content": EVALUATION_SYSTEM_PROMPT},
+            {"role": "user", "content": (
+                f"Rate each of the following {len(pairs)} question/answer pairs from a "
+                f"{context['experience_level']} level candidate for a {context['role'] or 'technical'} "
+                "position out of 10, applying the criteria that fit each pair's question_type.\n"
+                'Return ONLY JSON: [{"index": 0, "rating": 7}, ...] with one entry per pair.\n'
+                f"Pairs:\n{orjson.dumps(pairs).decode()}"
+            )}
+        ]
+
+        try:
+            start_time = time.time()
+            raw_result = await llm.complete_chat(messages)
+            elapsed_time = time.time() - start_time
+            ratings = self._parse_batch_ratings(raw_result, len(pairs))
+        except Exception as e:
+            print(f"Batched evaluation failed, evaluating individually: {e}")
+            return None
+
+        if ratings is None:
+            print("Batched evaluation returned unparseable output, evaluating individually")
+            return None
+
+        evaluations = [
+            (response["question"], response["answer"], score, pair["question_type"], elapsed_time / len(pairs))
+            for response, pair, score in zip(responses, pairs, ratings)
+        ]
+        # Caching embeds each answer, so keep those calls off the event loop
+        await asyncio.to_thread(self._cache_evaluations, evaluations)
+        for evaluation in evaluations:
+            self._record_evaluation(*evaluation, cache=False)
+        return ratings
+
+    def _parse_batch_ratings(self, raw_result: str, count: int) -> Optional[List[int]]:
+        """Parse a JSON array of {index, rating} objects into scores ordered by index."""
+        try:
+            items = orjson.loads(raw_result)
+        except orjson.JSONDecodeError:
+            match = re.search(r'\[.*\]', raw_result, re.S)
+            if not match:
+                return None
+            try:
+                items = orjson.loads(match.group(0))
+            except orjson.JSONDecodeError:
+                return None
+
+        if not isinstance(items, list):
+            return None
+
+        ratings: Dict[int, int] = {}
+        for item in items:
+            if not isinstance(item, dict):
+                return None
+            try:
+                index = int(item["index"])
+                rating = int(float(item["rating"]))
+            except (KeyError, TypeError, ValueError):
+                return None
+            if 0 <= index < count and 0 <= rating <= 10:
+                ratings[index] = rating
+
+        if len(ratings) != count:
+            return None
+        return [ratings[i] for i in range(count)]
+
     def get_evaluation_statistics(self) -> Dict[str, Any]:
         """
         Get statistics about the evaluations performed.
@@ -349,34 +943,17 @@ class InterviewEvaluator:
         Returns:
             Dictionary with evaluation statistics
         """
-        if not self.evaluation_history:
+        if not self._score_count:
             return {"count": 0, "average_score": 0}
         
-        scores = [float(e["evaluation"]) for e in self.evaluation_history]
-        avg_score = sum(scores) / len(scores)
-        
-        # Group by question type
-        question_type_scores = {}
-        for eval_item in self.evaluation_history:
-            q_type = eval_item["question_type"]
-            score = float(eval_item["evaluation"])
-            
-            if q_type not in question_type_scores:
-                question_type_scores[q_type] = []
-            
-            question_type_scores[q_type].append(score)
-        
-        # Calculate averages by question type
-        type_averages = {}
-        for q_type, scores in question_type_scores.items():
-            type_averages[q_type] = sum(scores) / len(scores)
-        
         return {
-            "count": len(scores),
-            "average_score": avg_score,
-            "min_score": min(scores),
-            "max_score": max(scores),
-            "by_question_type": type_averages
+            "count": self._score_count,
+            "average_score": self._score_sum / self._score_count,
+            "min_score": self._score_min,
+            "max_score": self._score_max,
+            "by_question_type": {
+                q_type: total / count for q_type, (total, count) in self._type_sum.items()
+            }
         }
 
 # Example usage
@@ -0,0 +1,96 @@
+# llm.py
+from typing import AsyncIterator, Dict, List
+import httpx
+import openai
+from openai import AsyncOpenAI, OpenAI
+from langchain_openai import ChatOpenAI
+from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
+import config
+
+# Retry transient provider failures (429s, dropped connections, 5xx) with exponential backoff
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+llm_retry = retry(
+    wait=wait_exponential(multiplier=1, min=1, max=30),
+    stop=stop_after_attempt(6),
+    retry=retry_if_exception_type(RETRYABLE_ERRORS),
+    reraise=True
+)
+
+# One keep-alive connection pool per process, shared by every LLM call
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+http_client = httpx.Client(limits=HTTP_LIMITS)
+async_http_client = httpx.AsyncClient(limits=HTTP_LIMITS)
+
+sync_client = OpenAI(
+    api_key=config.OPENAI_API_KEY,
+    base_url=config.OPENAI_API_BASE,
+    http_client=http_client
+)
+async_client = AsyncOpenAI(
+    api_key=config.OPENAI_API_KEY,
+    base_url=config.OPENAI_API_BASE,
+    http_client=async_http_client
+)
+
+def get_async_client() -> AsyncOpenAI:
+    """Return the process-wide async client for the configured OpenAI-compatible endpoint."""
+    return async_client
+
+def get_chat_model(**params) -> ChatOpenAI:
+    """
+    Build a LangChain chat model for CrewAI agents that reuses the shared clients.
+
+    Args:
+        **params: Extra ChatOpenAI settings (model defaults to OPENAI_MODEL_NAME)
+    """
+    params.setdefault("model", config.OPENAI_MODEL_NAME or "gpt-4")
+    return ChatOpenAI(
+        client=sync_client.chat.completions,
+        async_client=async_client.chat.completions,
+        **params
+    )
+
+@llm_retry
+def kickoff_with_retry(crew, **kwargs):
+    """Run crew.kickoff(), retrying transient LLM errors."""
+    return crew.kickoff(**kwargs)
+
+async def aclose() -> None:
+    """Close the shared connection pools (call on application shutdown)."""
+    await async_http_client.aclose()
+    http_client.close()
+
+async def stream_chat(messages: List[Dict[str, str]], **params) -> AsyncIterator[str]:
+    """
+    Stream the text of a chat completion as it is generated.
+
+    Args:
+        messages: Chat messages to send
+        **params: Extra completion parameters (model defaults to OPENAI_MODEL_NAME)
+
+    Yields:
+        Text deltas in the order the model emits them
+    """
+    params.setdefault("model", config.OPENAI_MODEL_NAME)
+    stream = await get_async_client().chat.completions.create(
+        messages=messages,
+        stream=True,
+        **params
+    )
+    try:
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        # Release the connection even when the caller stops reading early
+        await stream.close()
+
+@llm_retry
+async def complete_chat(messages: List[Dict[str, str]], **params) -> str:
+    """Return the full text of a chat completion."""
+    params.setdefault("model", config.OPENAI_MODEL_NAME)
+    response = await get_async_client().chat.completions.create(
+        messages=messages,
+        **params
+    )
+    return response.choices[0].message.content or ""
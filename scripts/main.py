@@ -1,16 +1,51 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from collections import OrderedDict
+import os
+import time
+import json
 import uuid
+import hashlib
+import orjson
 import re
-import io
-from PyPDF2 import PdfReader
-from evaluator import InterviewEvaluator
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import config
+import llm
+from evaluator import InterviewEvaluator, flush_cache_writes
 from questions_generator import interview_candidate
-from resume_parser import extract_details as extract_resume_details
+from resume_parser import extract_details as extract_resume_details, get_cached_extraction
+from semantic_cache import get_default_question_cache
+from pdf_text import PDF_PAGES_PER_WORKER, extract_pdf_pages, extract_short_pdf
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
+
+# ✅ Question delimiters, compiled once (splitting is linear, unlike lazy DOTALL lookaheads)
+QUESTION_SPLIT = re.compile(r'Question\s+\d+:\s*')
+NUMBERED_SPLIT = re.compile(r'(?m)^\s*\d+\.\s*')
+QUESTION_START = re.compile(r'(what|how|why|describe|tell|can you|explain|discuss|imagine|provide)\b', re.IGNORECASE)
+
+# ✅ PDF extraction: long documents are split into page ranges parsed in worker processes,
+# created at startup (see start_pdf_pool)
+pdf_pool: Optional[ProcessPoolExecutor] = None
+
+# ✅ Generated questions keyed by resume text and role, reused until QUESTIONS_CACHE_TTL
+questions_cache: Dict[str, Tuple[float, List[str]]] = {}
+questions_redis = None
+sessions_redis = None
+if config.REDIS_URL:
+    import redis
+    import redis.asyncio
+    questions_redis = redis.Redis.from_url(config.REDIS_URL)
+    sessions_redis = redis.asyncio.Redis.from_url(config.REDIS_URL)
+
+# ✅ Extracted skills kept per session for evaluation context
+MAX_SESSION_RESUME_CHARS = 20000
 
 # ✅ CORS
 app.add_middleware(
@@ -22,7 +57,183 @@ app.add_middleware(
 )
 
 # ✅ Session store
-user_sessions = {}
+@dataclass
+class SessionState:
+    session_id: str
+    questions: List[str]
+    context: Dict
+    index: int = 0
+    responses: List[Dict] = field(default_factory=list)
+    score_total: float = 0.0
+    evaluator: Optional[InterviewEvaluator] = None
+    question_types: Dict[int, str] = field(default_factory=dict)
+    last_access: float = field(default_factory=time.time)
+    # Serialises this worker's updates; LLM calls run outside it
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def to_payload(self) -> bytes:
+        # The evaluator isn't serialised; it is rebuilt from context on another worker
+        return orjson.dumps({
+            "questions": self.questions,
+            "context": self.context,
+            "index": self.index,
+            "responses": self.responses,
+            "score_total": self.score_total,
+            "question_types": self.question_types
+        }, option=orjson.OPT_NON_STR_KEYS)
+
+    @classmethod
+    def from_payload(cls, session_id: str, payload: bytes) -> "SessionState":
+        data = orjson.loads(payload)
+        return cls(
+            session_id=session_id,
+            questions=data["questions"],
+            context=data["context"],
+            index=data["index"],
+            responses=data["responses"],
+            score_total=data["score_total"],
+            question_types={int(k): v for k, v in data["question_types"].items()}
+        )
+
+    def refresh(self, payload: bytes) -> None:
+        # Questions and context are fixed at upload; only progress changes afterwards
+        data = orjson.loads(payload)
+        self.index = data["index"]
+        self.responses = data["responses"]
+        self.score_total = data["score_total"]
+        self.question_types = {int(k): v for k, v in data["question_types"].items()}
+
+    def get_question_type(self, index: int) -> str:
+        # Filled in at upload; classifies on demand only for entries that are missing
+        question_type = self.question_types.get(index)
+        if question_type is None:
+            question_type = InterviewEvaluator._analyze_question_type(self.questions[index])
+            self.question_types[index] = question_type
+        return question_type
+
+    def get_evaluator(self) -> InterviewEvaluator:
+        # Created at upload; only sessions loaded from Redis by another worker build one here
+        if self.evaluator is None:
+            self.evaluator = InterviewEvaluator(
+                role=self.context["role"],
+                resume_data=self.context["resume_data"]
+            )
+        return self.evaluator
+
+# Process-local sessions, least recently used first. With REDIS_URL set, Redis is
+# the source of truth: every read refreshes from it and updates are transactions,
+# so any worker can serve any session and workers never claim the same question
+user_sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+
+# Strong references to in-flight batch evaluations so they aren't garbage collected
+batch_jobs = set()
+# Sessions with batch evaluations still running (session_id -> job count); never evicted
+pending_batches: Dict[str, int] = {}
+
+def evict_sessions(now: float) -> None:
+    # Oldest entries sit at the front, so stop at the first live one within the size cap.
+    # Sessions waiting on a batch job are moved to the back instead of dropped
+    for _ in range(len(user_sessions)):
+        oldest_id, oldest = next(iter(user_sessions.items()))
+        if now - oldest.last_access < config.SESSION_TTL and len(user_sessions) <= config.SESSION_MAX:
+            break
+        if oldest_id in pending_batches:
+            user_sessions.move_to_end(oldest_id)
+        else:
+            del user_sessions[oldest_id]
+
+async def get_session(session_id: str) -> SessionState:
+    now = time.time()
+    evict_sessions(now)
+
+    session = user_sessions.get(session_id)
+    if sessions_redis is not None:
+        # Another worker may have moved the session on since it was cached here
+        payload = await sessions_redis.get(f"sess:{session_id}")
+        if not payload:
+            user_sessions.pop(session_id, None)
+            session = None
+        elif session is None:
+            session = SessionState.from_payload(session_id, payload)
+        else:
+            session.refresh(payload)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    remember_session(session)
+    return session
+
+async def claim_remaining_questions(session: SessionState, answer_count: int) -> List[str]:
+    """Claim the next answer_count questions of a session and return all that were remaining."""
+    def claim(session):
+        remaining = session.questions[session.index:]
+        if not remaining:
+            raise HTTPException(status_code=400, detail="No more questions")
+        if answer_count > len(remaining):
+            raise HTTPException(status_code=400, detail="More responses than remaining questions")
+        session.index += answer_count
+        return remaining
+
+    return await update_session(session, claim)
+
+async def keep_session_alive(session_id: str) -> None:
+    # Batch jobs outlive SESSION_TTL, so keep pushing the Redis expiry back while one runs
+    while True:
+        await asyncio.sleep(config.SESSION_TTL / 2)
+        await sessions_redis.expire(f"sess:{session_id}", config.SESSION_TTL)
+
+def record_evaluations(session: SessionState, evaluations: List[Dict]) -> None:
+    session.responses.extend(evaluations)
+    session.score_total += sum(e["evaluation"] for e in evaluations)
+
+def remember_session(session: SessionState) -> None:
+    session.last_access = time.time()
+    if session.session_id not in user_sessions:
+        user_sessions[session.session_id] = session
+        evict_sessions(session.last_access)
+    user_sessions.move_to_end(session.session_id)
+
+async def save_session(session: SessionState) -> None:
+    remember_session(session)
+    if sessions_redis is not None:
+        await sessions_redis.set(f"sess:{session.session_id}", session.to_payload(), ex=config.SESSION_TTL)
+
+async def update_session(session: SessionState, mutate):
+    """
+    Apply mutate(session) to the latest state of a session and persist it.
+
+    With Redis the read-modify-write runs under WATCH/MULTI and is retried if
+    another worker writes the session in between, so mutate must only change
+    the session once its checks pass (it may raise HTTPException before that).
+
+    Returns:
+        Whatever mutate returns
+    """
+    async with session.lock:
+        if sessions_redis is None:
+            result = mutate(session)
+            remember_session(session)
+            return result
+
+        key = f"sess:{session.session_id}"
+        async with sessions_redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(key)
+                    payload = await pipe.get(key)
+                    if not payload:
+                        raise HTTPException(status_code=404, detail="Session not found")
+                    session.refresh(payload)
+                    result = mutate(session)
+                    pipe.multi()
+                    pipe.set(key, session.to_payload(), ex=config.SESSION_TTL)
+                    await pipe.execute()
+                    break
+                except redis.WatchError:
+                    continue
+
+        remember_session(session)
+        return result
 
 class ResumeContent(BaseModel):
     content: str
@@ -30,6 +241,38 @@ class ResumeContent(BaseModel):
 class ResponseModel(BaseModel):
     response: str
 
+class AllResponsesModel(BaseModel):
+    responses: List[str]
+
+@app.on_event("startup")
+async def raise_thread_pool_limits():
+    config.configure_thread_pools()
+
+@app.on_event("startup")
+async def start_pdf_pool():
+    global pdf_pool
+    # Spawned rather than forked: forking a process that already runs threads can
+    # leave a held lock copied into the child
+    pdf_pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+
+@app.on_event("shutdown")
+async def close_llm_clients():
+    await llm.aclose()
+
+@app.on_event("shutdown")
+async def flush_evaluation_cache():
+    await asyncio.to_thread(flush_cache_writes)
+
+@app.on_event("shutdown")
+async def close_sessions_redis():
+    if sessions_redis is not None:
+        await sessions_redis.aclose()
+
+@app.on_event("shutdown")
+async def close_pdf_pool():
+    if pdf_pool is not None:
+        pdf_pool.shutdown(wait=False, cancel_futures=True)
+
 @app.get("/")
 def health():
     return {"status": "running"}
@@ -37,35 +280,65 @@ def health():
 @app.post("/api/upload-resume")
 async def upload_resume(resume: UploadFile = File(...), role: str = Form(...)):
     try:
-        contents = await resume.read()
-        reader = PdfReader(io.BytesIO(contents))
-        text = "\n".join(page.extract_text() for page in reader.pages if page.extract_text())
+        text = await extract_pdf_text(resume)
+
+        # A re-uploaded resume for the same role skips extraction and generation
+        cache_key = hashlib.sha256(f"{role}\0{text}".encode()).hexdigest()
+        questions = await asyncio.to_thread(get_cached_questions, cache_key)
+
+        if questions is None:
+            # Repeat uploads (e.g. for another role) are served from the parser's cache
+            resume_details = await extract_resume_details(ResumeContent(content=text))
+        else:
+            # Only reuse an extraction this worker already has; skill context is optional
+            resume_details = get_cached_extraction(text)
+        resume_data = evaluator_resume_data(resume_details)
+
+        # Build the evaluator alongside question generation so the first answer doesn't pay for it
+        evaluator_task = asyncio.create_task(
+            asyncio.to_thread(InterviewEvaluator, role=role, resume_data=resume_data)
+        )
 
-        resume_details = await extract_resume_details(ResumeContent(content=text))
-        simplified_resume = f"""
+        if questions is None:
+            simplified_resume = f"""
 Skills:\n{resume_details.get("skills", "")}\n
 Experience:\n{resume_details.get("experience", "")}\n
 Education:\n{resume_details.get("education", "")}
-        """
-
-        questions_text = interview_candidate(
-            resume=simplified_resume,
-            role=role,
-            skills=resume_details.get("skills", ""),
-            experience=resume_details.get("experience", ""),
-            education=resume_details.get("education", "")
-        )
+            """
+
+            # A lightly edited copy of the same resume for the same role reuses the earlier question set
+            question_cache = get_default_question_cache()
+            if question_cache:
+                questions = await asyncio.to_thread(question_cache.lookup, role, text)
+
+            if questions is None:
+                questions_text = await interview_candidate(
+                    resume=simplified_resume,
+                    role=role,
+                    skills=resume_details.get("skills", ""),
+                    experience=resume_details.get("experience", ""),
+                    education=resume_details.get("education", "")
+                )
+
+                questions = extract_questions(questions_text)
+                if questions and question_cache:
+                    await asyncio.to_thread(question_cache.insert, role, text, questions)
+
+            if questions:
+                await asyncio.to_thread(cache_questions, cache_key, questions)
 
-        questions = extract_questions(questions_text)
         session_id = str(uuid.uuid4())
 
-        user_sessions[session_id] = {
-            "questions": questions,
-            "index": 0,
-            "responses": [],
-            "context": {"role": role, "resume_data": text},
-            "evaluator": None
-        }
+        await save_session(SessionState(
+            session_id=session_id,
+            questions=questions,
+            context={"role": role, "resume_data": resume_data},
+            evaluator=await evaluator_task,
+            # Classified up front so get-question and submit-response are plain lookups
+            question_types={
+                i: InterviewEvaluator._analyze_question_type(question) for i, question in enumerate(questions)
+            }
+        ))
 
         return {
             "success": True,
@@ -79,12 +352,10 @@ Education:\n{resume_details.get("education", "")}
 
 @app.get("/api/get-question")
 async def get_question(session_id: str):
-    session = user_sessions.get(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+    session = await get_session(session_id)
 
-    index = session["index"]
-    questions = session["questions"]
+    index = session.index
+    questions = session.questions
     if index >= len(questions):
         return {"question": "No questions available.", "remaining": 0}
 
@@ -92,74 +363,229 @@ async def get_question(session_id: str):
         "question": questions[index],
         "remaining": len(questions) - index - 1,
         "question_index": index,
-        "question_type": "unknown"
+        "question_type": session.get_question_type(index)
     }
 
 @app.post("/api/submit-response")
 async def submit_response(user_response: ResponseModel, session_id: str = Query(...)):
-    session = user_sessions.get(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+    session = await get_session(session_id)
+    questions = session.questions
 
-    index = session["index"]
-    questions = session["questions"]
+    # Claim the current question so a concurrent submit moves on to the next one
+    def claim(session):
+        index = session.index
+        if index >= len(questions):
+            raise HTTPException(status_code=400, detail="No more questions")
+        session.index += 1
+        return index
 
-    if index >= len(questions):
-        raise HTTPException(status_code=400, detail="No more questions")
+    index = await update_session(session, claim)
+    evaluator = session.get_evaluator()
 
     question = questions[index]
-    if not session["evaluator"]:
-        session["evaluator"] = InterviewEvaluator(
-            role=session["context"]["role"],
-            resume_data=session["context"]["resume_data"]
-        )
+    q_type = session.get_question_type(index)
+    score = await asyncio.to_thread(
+        evaluator.evaluate_response, question, user_response.response, session.context, q_type
+    )
 
-    evaluator = session["evaluator"]
-    score = evaluator.evaluate_response(question, user_response.response, session["context"])
-    q_type = evaluator._analyze_question_type(question)
+    def record(session):
+        session.responses.append({
+            "question": question,
+            "answer": user_response.response,
+            "evaluation": score,
+            "question_type": q_type
+        })
+        session.score_total += score
 
-    session["responses"].append({
-        "question": question,
-        "answer": user_response.response,
-        "evaluation": score,
-        "question_type": q_type
-    })
-    session["index"] += 1
+    await update_session(session, record)
 
     return {
         "evaluation": score,
         "question_type": q_type,
         "question_index": index,
         "total_questions": len(questions),
-        "interview_complete": session["index"] >= len(questions)
+        "interview_complete": session.index >= len(questions)
     }
 
+@app.post("/api/submit-all-responses")
+async def submit_all_responses(user_responses: AllResponsesModel, session_id: str = Query(...)):
+    session = await get_session(session_id)
+    questions = session.questions
+
+    remaining = await claim_remaining_questions(session, len(user_responses.responses))
+    evaluator = session.get_evaluator()
+
+    # Answers map to the remaining questions in order and are rated concurrently
+    evaluations = await evaluator.evaluate_all_responses(
+        [
+            {"question": question, "answer": answer}
+            for question, answer in zip(remaining, user_responses.responses)
+        ],
+        session.context
+    )
+
+    await update_session(session, lambda session: record_evaluations(session, evaluations))
+
+    return {
+        "evaluations": [
+            {"evaluation": e["evaluation"], "question_type": e["question_type"]}
+            for e in evaluations
+        ],
+        "total_questions": len(questions),
+        "interview_complete": session.index >= len(questions)
+    }
+
+@app.post("/api/submit-all-responses-batch")
+async def submit_all_responses_batch(user_responses: AllResponsesModel, session_id: str = Query(...),
+                                     mode: str = Query("batch")):
+    # Anything but mode=batch uses the real-time concurrent path
+    if mode != "batch":
+        return await submit_all_responses(user_responses, session_id)
+
+    session = await get_session(session_id)
+    questions = session.questions
+
+    remaining = await claim_remaining_questions(session, len(user_responses.responses))
+    evaluator = session.get_evaluator()
+
+    pairs = [
+        {"question": question, "answer": answer}
+        for question, answer in zip(remaining, user_responses.responses)
+    ]
+
+    # The provider completes batches within 24h (at half the cost), so results
+    # land in the session in the background and show up in /api/get-results
+    async def run_batch():
+        heartbeat = asyncio.create_task(keep_session_alive(session_id)) if sessions_redis is not None else None
+        try:
+            try:
+                evaluations = await evaluator.evaluate_all_responses_batch(pairs, session.context)
+            except Exception as e:
+                print(f"BATCH ERROR: {str(e)}")
+                evaluations = await evaluator.evaluate_all_responses(pairs, session.context)
+
+            await update_session(session, lambda session: record_evaluations(session, evaluations))
+        except Exception as e:
+            print(f"BATCH ERROR: Results for session {session_id} were not saved: {str(e)}")
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+            pending_batches[session_id] -= 1
+            if not pending_batches[session_id]:
+                del pending_batches[session_id]
+
+    # Pinned before the job starts so the session can't be evicted while it waits
+    pending_batches[session_id] = pending_batches.get(session_id, 0) + 1
+    job = asyncio.create_task(run_batch())
+    batch_jobs.add(job)
+    job.add_done_callback(batch_jobs.discard)
+
+    return {
+        "submitted": len(pairs),
+        "status": "pending",
+        "total_questions": len(questions),
+        "interview_complete": session.index >= len(questions)
+    }
+
+@app.post("/api/end-session")
+async def end_session(session_id: str = Query(...)):
+    user_sessions.pop(session_id, None)
+    if sessions_redis is not None:
+        await sessions_redis.delete(f"sess:{session_id}")
+    return {"success": True}
+
 @app.get("/api/get-results")
 async def get_results(session_id: str):
-    session = user_sessions.get(session_id)
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+    session = await get_session(session_id)
 
-    responses = session["responses"]
-    total_score = sum(float(r["evaluation"]) for r in responses)
-    avg_score = total_score / len(responses) if responses else 0
+    responses = list(session.responses)
+    avg_score = session.score_total / len(responses) if responses else 0
 
     return {
         "responses": responses,
-        "total_questions": len(session["questions"]),
+        "total_questions": len(session.questions),
         "answered_questions": len(responses),
+        "pending_evaluations": session.index - len(responses),
         "average_score": round(avg_score, 1)
     }
 
+def evaluator_resume_data(resume_details):
+    # The evaluator only reads skills and years, so the session keeps just those
+    if not resume_details:
+        return None
+    return {
+        "skills": str(resume_details.get("skills", ""))[:MAX_SESSION_RESUME_CHARS],
+        "years_of_experience": resume_details.get("years_of_experience", 0)
+    }
+
+def get_cached_questions(cache_key):
+    entry = questions_cache.get(cache_key)
+    if entry and time.time() - entry[0] < config.QUESTIONS_CACHE_TTL:
+        return entry[1]
+
+    if questions_redis is not None:
+        try:
+            cached = questions_redis.get(f"questions:{cache_key}")
+            if cached:
+                questions = json.loads(cached)
+                questions_cache[cache_key] = (time.time(), questions)
+                return questions
+        except Exception as e:
+            print(f"Warning: Failed to read cached questions from Redis: {e}")
+    return None
+
+def cache_questions(cache_key, questions):
+    questions_cache[cache_key] = (time.time(), questions)
+    if questions_redis is not None:
+        try:
+            questions_redis.setex(f"questions:{cache_key}", config.QUESTIONS_CACHE_TTL, json.dumps(questions))
+        except Exception as e:
+            print(f"Warning: Failed to save questions to Redis: {e}")
+
+async def extract_pdf_text(upload: UploadFile):
+    """Extract the text of an uploaded PDF without blocking the event loop."""
+    texts, page_count = await asyncio.to_thread(extract_short_pdf, upload.file)
+
+    if texts is None:
+        # Threads in this process share pdfium_lock, so real parallelism across
+        # pages needs processes, which are sent the raw bytes
+        await upload.seek(0)
+        contents = await upload.read()
+        loop = asyncio.get_running_loop()
+        chunks = await asyncio.gather(*(
+            loop.run_in_executor(pdf_pool, extract_pdf_pages, contents, start, min(start + PDF_PAGES_PER_WORKER, page_count))
+            for start in range(0, page_count, PDF_PAGES_PER_WORKER)
+        ))
+        texts = [text for chunk in chunks for text in chunk]
+
+    return "\n".join(text for text in texts if text)
+
+def iter_questions(text):
+    """Yield the questions in generated text, skipping anything before the first delimiter."""
+    parts = QUESTION_SPLIT.split(text)
+    if len(parts) == 1:
+        # Fall back to a plain numbered list
+        parts = NUMBERED_SPLIT.split(text)
+
+    if len(parts) == 1:
+        # Last resort: lines that read like questions, in one pass without lowercasing each line
+        for line in text.split("\n"):
+            if (question := line.strip()) and len(question) >= 20 and (question.endswith("?") or QUESTION_START.match(question)):
+                yield question
+        return
+
+    for part in parts[1:]:
+        question = part.strip()
+        if question:
+            yield question
+
 def extract_questions(text):
-    standard = re.findall(r'Question\\s+\\d+:\\s*(.+?)(?=\\s*Question\\s+\\d+:|$)', text, re.DOTALL)
-    if standard:
-        return [q.strip() for q in standard if q.strip()]
-    numbered = re.findall(r'\\d+\\.\\s*(.+?)(?=\\s*\\d+\\.|$)', text, re.DOTALL)
-    return [q.strip() for q in numbered if q.strip()] if numbered else []
+    return list(iter_questions(text))
     
 if __name__ == "__main__":
-    import os
     import uvicorn
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run("main:app", host="0.0.0.0", port=port)
+    # C event loop and HTTP parser; one worker per core only when sessions live in Redis
+    # (see update_session), since process-local sessions can't be shared
+    workers = os.cpu_count() if config.REDIS_URL else 1
+    uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers, loop="uvloop", http="httptools")
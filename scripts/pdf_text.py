@@ -0,0 +1,47 @@
+# pdf_text.py
+import io
+import threading
+import pypdfium2 as pdfium
+
+# Long documents are split into page ranges of this size and parsed in worker processes.
+# Workers are spawned and import only this module, not the API and its clients
+PDF_PAGES_PER_WORKER = 4
+
+# PDFium isn't thread-safe, so parses in the server process's threads take turns.
+# Pool workers run one task at a time and don't need it
+pdfium_lock = threading.Lock()
+
+def extract_page_text(pdf, index):
+    page = pdf[index]
+    textpage = page.get_textpage()
+    try:
+        return textpage.get_text_bounded()
+    finally:
+        textpage.close()
+        page.close()
+
+def extract_short_pdf(file):
+    """
+    Extract every page of a short PDF in this process.
+
+    Returns:
+        Tuple of (page texts, or None if the document needs the worker pool, page count)
+    """
+    # Parses straight from the upload's spooled file, so no in-memory copy is made
+    with pdfium_lock:
+        pdf = pdfium.PdfDocument(file)
+        try:
+            page_count = len(pdf)
+            if page_count > PDF_PAGES_PER_WORKER:
+                return None, page_count
+            return [extract_page_text(pdf, i) for i in range(page_count)], page_count
+        finally:
+            pdf.close()
+
+def extract_pdf_pages(contents, start, stop):
+    """Extract pages [start, stop) of a PDF given as raw bytes; runs in pool workers."""
+    pdf = pdfium.PdfDocument(io.BytesIO(contents))
+    try:
+        return [extract_page_text(pdf, i) for i in range(start, stop)]
+    finally:
+        pdf.close()
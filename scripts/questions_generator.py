@@ -1,13 +1,155 @@
 # questions_generator.py
-import os
-from crewai import Agent, Task, Crew, Process
-from dotenv import load_dotenv
-import random
+import asyncio
+import llm
 import re
+import orjson
 
-def interview_candidate(resume, role, skills, experience, education):
+# Matches the "Question N:" prefix the generator is asked to emit
+QUESTION_HEADER_PATTERN = re.compile(r'Question\s+\d+:\s*')
+
+# Prompt text shared by the batch and streaming generation paths
+JOB_ANALYST_BACKSTORY = (
+    "You are an expert job analyst with extensive knowledge of different industries and roles. "
+    "Your task is to analyze a job role and identify the key skills, experiences, and competencies "
+    "that would be important for success in this position. You understand how different roles vary "
+    "across industries and can identify both the technical and soft skills required."
+)
+
+RESUME_ANALYZER_BACKSTORY = (
+    "You are an expert resume analyzer with years of experience in talent acquisition. "
+    "You specialize in identifying the alignment between a candidate's background and job requirements, "
+    "detecting potential gaps or inconsistencies, and finding areas that require further probing during interviews. "
+    "Your analysis helps create targeted, personalized interview questions that reveal a candidate's true qualifications."
+)
+
+QUESTION_GENERATION_DESCRIPTION = (
+    "Based on the job role analysis and resume analysis, generate 10-12 high-quality interview questions that will thoroughly assess this candidate.\n"
+    "Create a mix of the following question types:\n"
+    "- 3-4 technical/skills assessment questions based on the role requirements\n"
+    "- 2-3 behavioral questions about past experiences\n"
+    "- 1-2 situational/hypothetical scenario questions\n"
+    "- 1-2 questions about gaps or inconsistencies in the resume\n"
+    "- 1 question about the candidate's interest in the role and company\n"
+    "- 1 question about career goals and growth\n\n"
+    "Format each question as 'Question X: [Your question here]' on a new line."
+)
+
+# Static prompt prefixes: per-request details (role, resume fields) are appended at the
+# end so the provider's prompt-prefix cache can reuse everything before them
+QUESTION_GENERATOR_BACKSTORY = (
+    "You are an AI-powered interview question generator designed to create highly effective interview questions. "
+    "You understand that good interview questions should be behavioral and situational, requiring candidates to provide specific examples. "
+    "Your questions focus primarily on assessing how the candidate's **work experience** aligns with the requirements of the target position. "
+    "You also evaluate their **education** relevance, and how they've applied their **skills** in real-world scenarios. "
+    "You create questions that assess technical competence, problem-solving abilities, teamwork, communication, and cultural fit. "
+    "Your questions are thought-provoking and designed to reveal the candidate's true capabilities beyond what's written on their resume."
+)
+
+JOB_ANALYSIS_INSTRUCTIONS = (
+    "Analyze the job role given below to identify: \n"
+    "1. Key technical skills required\n"
+    "2. Necessary soft skills\n"
+    "3. Common challenges faced in this role\n"
+    "4. Experience level expectations\n"
+    "5. Industry-specific knowledge requirements\n"
+    "This analysis will be used to generate relevant interview questions."
+)
+
+RESUME_ANALYSIS_INSTRUCTIONS = (
+    "Analyze the candidate's profile given below for the target position.\n"
+    "Identify:\n"
+    "1. Strengths that align well with the role\n"
+    "2. Potential gaps or missing qualifications\n"
+    "3. Areas where the candidate's claims need verification\n"
+    "4. Experiences that require deeper explanation\n"
+    "5. Unique aspects of the candidate's background worth exploring"
+)
+
+# One-call variant: all three steps in a single JSON-mode completion
+SINGLE_CALL_INSTRUCTIONS = (
+    "Work through the following three steps for the candidate described below.\n\n"
+    f"Step 1 - Job role analysis:\n{JOB_ANALYSIS_INSTRUCTIONS}\n\n"
+    f"Step 2 - Resume analysis:\n{RESUME_ANALYSIS_INSTRUCTIONS}\n\n"
+    f"Step 3 - Question generation:\n{QUESTION_GENERATION_DESCRIPTION}\n\n"
+    "Return ONLY a JSON object with the keys \"job_analysis\" (string), \"resume_analysis\" (string) "
+    "and \"questions\" (array of question strings without the 'Question X:' prefix)."
+)
+
+def question_generator_backstory(role):
+    # The candidate's skills, experience and education reach the generator through
+    # the resume analysis it receives as context, so they aren't repeated here
+    return f"{QUESTION_GENERATOR_BACKSTORY}\n\nTarget role: {role}"
+
+def job_analysis_description(role):
+    return f"{JOB_ANALYSIS_INSTRUCTIONS}\n\nJob role: {role}"
+
+def candidate_context(role, skills, experience, education):
+    return (
+        "Candidate context:\n"
+        f"Role: {role}\n"
+        f"Experience: {experience}\n"
+        f"Skills: {skills}\n"
+        f"Education: {education}"
+    )
+
+def resume_analysis_description(role, skills, experience, education):
+    return f"{RESUME_ANALYSIS_INSTRUCTIONS}\n\n{candidate_context(role, skills, experience, education)}"
+
+async def analyze_candidate(role, skills, experience, education):
+    """Run the independent job role and resume analyses concurrently."""
+    return await asyncio.gather(
+        llm.complete_chat([
+            {"role": "system", "content": JOB_ANALYST_BACKSTORY},
+            {"role": "user", "content": job_analysis_description(role)}
+        ]),
+        llm.complete_chat([
+            {"role": "system", "content": RESUME_ANALYZER_BACKSTORY},
+            {"role": "user", "content": resume_analysis_description(role, skills, experience, education)}
+        ])
+    )
+
+def question_generation_messages(role, job_analysis, resume_analysis):
+    """Build the question generation prompt from both analyses."""
+    return [
+        {"role": "system", "content": question_generator_backstory(role)},
+        {"role": "user", "content": (
+            f"{QUESTION_GENERATION_DESCRIPTION}\n\n"
+            f"Job role analysis:\n{job_analysis}\n\n"
+            f"Candidate profile analysis:\n{resume_analysis}"
+        )}
+    ]
+
+async def generate_questions_single_call(role, skills, experience, education):
+    """
+    Run job analysis, resume analysis and question generation as one JSON-mode completion.
+
+    Returns:
+        list: Generated questions, or None if the reply wasn't usable
+    """
+    try:
+        raw_result = await llm.complete_chat(
+            [
+                {"role": "system", "content": QUESTION_GENERATOR_BACKSTORY},
+                {"role": "user", "content": f"{SINGLE_CALL_INSTRUCTIONS}\n\n{candidate_context(role, skills, experience, education)}"}
+            ],
+            response_format={"type": "json_object"}
+        )
+        questions = orjson.loads(raw_result).get("questions")
+    except Exception as e:
+        print(f"Single-call question generation failed, using the three-step path: {e}")
+        return None
+
+    if not isinstance(questions, list) or not all(isinstance(q, str) for q in questions):
+        return None
+    return questions
+
+async def interview_candidate(resume, role, skills, experience, education):
     """
     Generate tailored interview questions based on resume data and job role.
+
+    All three steps are first requested in a single JSON-mode completion. If
+    that reply can't be used, they run as separate completions: the job role
+    and resume analyses concurrently, then question generation with both.
     
     Args:
         resume (str): The full resume text
@@ -19,135 +161,41 @@ def interview_candidate(resume, role, skills, experience, education):
     Returns:
         str: Formatted interview questions
     """
-    load_dotenv()
-    api_key = os.getenv("API_KEY")
-    api_base = os.getenv("OPENAI_API_BASE")
-    api_model_name = os.getenv("OPENAI_MODEL_NAME")
-
-    os.environ["OPENAI_API_BASE"] = api_base
-    os.environ["OPENAI_MODEL_NAME"] = api_model_name
-    os.environ["OPENAI_API_KEY"] = api_key
-
-    # Enhanced job role analysis to provide more context
-    jobRoleAnalysisAgent = Agent(
-        role="Job Role Analyst",
-        goal="Analyze the target job role to identify key requirements and competencies needed for success",
-        backstory=(
-            "You are an expert job analyst with extensive knowledge of different industries and roles. "
-            "Your task is to analyze a job role and identify the key skills, experiences, and competencies "
-            "that would be important for success in this position. You understand how different roles vary "
-            "across industries and can identify both the technical and soft skills required."
-        ),
-        verbose=False,
-        allow_delegation=False
-    )
-
-    # Enhanced resume analysis agent
-    resumeAnalysisAgent = Agent(
-        role="Resume Deep Analyzer",
-        goal="Analyze the candidate's structured resume data to identify strengths, gaps, and areas for in-depth questioning",
-        backstory=(
-            "You are an expert resume analyzer with years of experience in talent acquisition. "
-            "You specialize in identifying the alignment between a candidate's background and job requirements, "
-            "detecting potential gaps or inconsistencies, and finding areas that require further probing during interviews. "
-            "Your analysis helps create targeted, personalized interview questions that reveal a candidate's true qualifications."
-        ),
-        verbose=False,
-        allow_delegation=False
-    )
+    questions = await generate_questions_single_call(role, skills, experience, education)
+    if questions:
+        return format_questions(questions)
 
-    # Question generation agent with improved context and capabilities
-    questionGeneratorAgent = Agent(
-        role="AI Interview Question Generator",
-        goal="Generate comprehensive, tailored interview questions that assess both technical qualifications and soft skills",
-        backstory=(
-            "You are an AI-powered interview question generator designed to create highly effective interview questions. "
-            "You understand that good interview questions should be behavioral and situational, requiring candidates to provide specific examples. "
-            f"Your questions focus primarily on assessing how the candidate's **work experience** ({experience}) aligns with the requirements of the {role} position. "
-            f"You also evaluate their **education** ({education}) relevance, and how they've applied their **skills** ({skills}) in real-world scenarios. "
-            "You create questions that assess technical competence, problem-solving abilities, teamwork, communication, and cultural fit. "
-            "Your questions are thought-provoking and designed to reveal the candidate's true capabilities beyond what's written on their resume."
-        ),
-        verbose=False,
-        allow_delegation=False
-    )
-
-    # Task for job role analysis
-    jobAnalysisTask = Task(
-        description=(
-            f"Analyze the job role '{role}' to identify: \n"
-            "1. Key technical skills required\n"
-            "2. Necessary soft skills\n"
-            "3. Common challenges faced in this role\n"
-            "4. Experience level expectations\n"
-            "5. Industry-specific knowledge requirements\n"
-            "This analysis will be used to generate relevant interview questions."
-        ),
-        agent=jobRoleAnalysisAgent,
-        expected_output="A structured analysis of the job role requirements in bullet points"
-    )
-
-    # Task for resume gap analysis
-    resumeAnalysisTask = Task(
-        description=(
-            f"Analyze the candidate's profile for the {role} position:\n"
-            f"- Skills: {skills}\n"
-            f"- Experience: {experience}\n"
-            f"- Education: {education}\n\n"
-            "Identify:\n"
-            "1. Strengths that align well with the role\n"
-            "2. Potential gaps or missing qualifications\n"
-            "3. Areas where the candidate's claims need verification\n"
-            "4. Experiences that require deeper explanation\n"
-            "5. Unique aspects of the candidate's background worth exploring"
-        ),
-        agent=resumeAnalysisAgent,
-        expected_output="A structured analysis of the candidate's profile with strengths and areas to probe"
-    )
-
-    # Task for generating questions
-    questionGenerationTask = Task(
-        description=(
-            "Based on the job role analysis and resume analysis, generate 10-12 high-quality interview questions that will thoroughly assess this candidate.\n"
-            "Create a mix of the following question types:\n"
-            "- 3-4 technical/skills assessment questions based on the role requirements\n"
-            "- 2-3 behavioral questions about past experiences\n"
-            "- 1-2 situational/hypothetical scenario questions\n"
-            "- 1-2 questions about gaps or inconsistencies in the resume\n"
-            "- 1 question about the candidate's interest in the role and company\n"
-            "- 1 question about career goals and growth\n\n"
-            "Format each question as 'Question X: [Your question here]' on a new line."
-        ),
-        agent=questionGeneratorAgent,
-        expected_output=("A numbered list of interview questions in the format: 'Question 1: [question text]', 'Question 2: [question text]', etc.")
-    )
-
-    # Create crew for sequential processing
-    interviewCrew = Crew(
-        agents=[jobRoleAnalysisAgent, resumeAnalysisAgent, questionGeneratorAgent],
-        tasks=[jobAnalysisTask, resumeAnalysisTask, questionGenerationTask],
-        verbose=0,
-        process=Process.sequential
-    )
+    job_analysis, resume_analysis = await analyze_candidate(role, skills, experience, education)
 
     # Get interview questions
-    result = interviewCrew.kickoff()
-    
-    # Convert CrewOutput to string - THIS FIXES THE ERROR
-    if hasattr(result, 'raw'):
-        questions_text = result.raw
-    elif hasattr(result, 'output'):
-        questions_text = result.output
-    elif not isinstance(result, str):
-        questions_text = str(result)
-    else:
-        questions_text = result
+    questions_text = await llm.complete_chat(question_generation_messages(role, job_analysis, resume_analysis))
     
     # Clean up and format the output
     questions = clean_questions(questions_text)
     
     return questions
 
+def accept_question(q, seen_questions):
+    """
+    Return the stripped question if it should be kept, otherwise None.
+
+    Skips questions that are too short or similar to one already seen, and
+    records the word set of accepted questions in seen_questions (a list).
+    """
+    q = q.strip()
+    # Skip too short questions
+    if len(q) < 10:
+        return None
+
+    # Skip duplicate questions (check for similarity); each question is split into words once
+    words = frozenset(q.lower().split())
+    for seen_words in seen_questions:
+        if similar_word_sets(words, seen_words):
+            return None
+
+    seen_questions.append(words)
+    return q
+
 def clean_questions(questions_text):
     """
     Clean up and format the questions output to ensure consistent formatting.
@@ -158,31 +206,27 @@ def clean_questions(questions_text):
     Returns:
         str: Cleaned and formatted questions
     """
-    # Extract questions using regex
-    question_pattern = re.compile(r'Question\s+\d+:\s*(.*?)(?=Question\s+\d+:|$)', re.DOTALL)
-    questions = question_pattern.findall(questions_text)
+    # Extract the text between "Question N:" prefixes (anything before the first is preamble)
+    return format_questions(QUESTION_HEADER_PATTERN.split(questions_text)[1:])
+
+def format_questions(questions):
+    """
+    De-duplicate a list of questions and format them as 'Question N: ...' lines.
     
+    Args:
+        questions (list): Raw question strings
+        
+    Returns:
+        str: Cleaned and formatted questions
+    """
     # Clean up each question and remove duplicates
     clean_questions = []
-    seen_questions = set()
+    seen_questions = []
     
     for q in questions:
-        q = q.strip()
-        # Skip too short questions
-        if len(q) < 10:
-            continue
-            
-        # Skip duplicate questions (check for similarity)
-        q_lower = q.lower()
-        is_duplicate = False
-        for seen_q in seen_questions:
-            if similar_questions(q_lower, seen_q):
-                is_duplicate = True
-                break
-                
-        if not is_duplicate:
+        q = accept_question(q, seen_questions)
+        if q:
             clean_questions.append(q)
-            seen_questions.add(q_lower)
     
     # Format the final output
     formatted_questions = ""
@@ -193,18 +237,25 @@ def clean_questions(questions_text):
 
 def similar_questions(q1, q2):
     """Check if questions are similar to avoid duplicates."""
+    return similar_word_sets(set(q1.split()), set(q2.split()))
+
+def similar_word_sets(words1, words2):
+    """Check if two questions' word sets are similar to avoid duplicates."""
     # Simple similarity check using Jaccard similarity of words
-    words1 = set(q1.split())
-    words2 = set(q2.split())
-    
     if not words1 or not words2:
         return False
+
+    # Jaccard can't exceed min/max of the set sizes, so lopsided pairs skip the intersection
+    smaller, larger = sorted((len(words1), len(words2)))
+    if smaller <= 0.7 * larger:
+        return False
         
-    intersection = words1.intersection(words2)
-    union = words1.union(words2)
+    # |A ∪ B| = |A| + |B| - |A ∩ B|, so only the intersection is materialised
+    intersection = len(words1 & words2)
+    union = len(words1) + len(words2) - intersection
     
     # If more than 70% of words are the same, consider them similar
-    return len(intersection) / len(union) > 0.7
+    return intersection / union > 0.7
 
 # Example usage
 if __name__ == "__main__":
@@ -214,5 +265,5 @@ if __name__ == "__main__":
     experience = "5 years of web development experience, led team of 3 developers, built e-commerce platform"
     education = "Bachelor of Computer Science, University of Wisconsin-Madison"
 
-    interview_questions = interview_candidate(resume, role, skills, experience, education)
+    interview_questions = asyncio.run(interview_candidate(resume, role, skills, experience, education))
     print(interview_questions)
\ No newline at end of file
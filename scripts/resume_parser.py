@@ -1,282 +1,346 @@
 # resume.py
 import os
 import re
+import json
+import asyncio
+import hashlib
+from collections import OrderedDict
+from datetime import date
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field
+from typing import Dict, Optional
 from crewai import Agent, Task, Crew, Process
-from dotenv import load_dotenv
 import uvicorn
+import config
+import llm
 
-app = FastAPI()
+try:
+    import re2
+except ImportError:  # Optional: without google-re2 the resume scans use the stdlib engine
+    re2 = None
 
-load_dotenv()
-api_key = os.getenv("API_KEY")
-api_base = os.getenv("OPENAI_API_BASE")
-api_model_name = os.getenv("OPENAI_MODEL_NAME")
+app = FastAPI(default_response_class=ORJSONResponse)
 
-os.environ["OPENAI_API_BASE"] = api_base
-os.environ["OPENAI_MODEL_NAME"] = api_model_name
-os.environ["OPENAI_API_KEY"] = api_key
+# "X years" mentions in extracted experience, including decimals and "X+ years"
+YEARS_PATTERN = re.compile(r'(\d+)(?:\.\d+)?\s*\+?\s*(?:years?|yrs?)', re.IGNORECASE)
+# "2019 - 2023" / "2021 - Present" ranges, the fallback when no years are stated
+EMPLOYMENT_RANGE_PATTERN = re.compile(r'(\d{4})\s*-\s*(\d{4}|Present|Current)', re.IGNORECASE)
+
+def compile_linear(pattern):
+    """
+    Compile a resume-scanning pattern with RE2 (linear time) when it is installed
+    and supports the pattern, otherwise with re. RE2's \s and \b are ASCII-only,
+    so only patterns that don't depend on Unicode whitespace should come here
+    """
+    if re2 is not None:
+        try:
+            return re2.compile(pattern)
+        except re2.error:
+            pass
+    return re.compile(pattern)
+
+# Resume clean-up patterns, compiled once at import. Whitespace stays on re: PDF text
+# is full of non-breaking and thin spaces, which RE2's ASCII \s doesn't match
+WHITESPACE_PATTERN = re.compile(r'\s+')
+SECTION_HEADERS = (
+    'EDUCATION', 'Education', 'EXPERIENCE', 'Experience', 'SKILLS', 'Skills',
+    'CERTIFICATIONS', 'Certifications', 'PROJECTS', 'Projects',
+    'WORK EXPERIENCE', 'Work Experience', 'PROFESSIONAL EXPERIENCE', 'Professional Experience',
+    'ACADEMIC BACKGROUND', 'Academic Background', 'TECHNICAL SKILLS', 'Technical Skills'
+)
+# One pass over the text for every header; longer headers come first so "WORK EXPERIENCE"
+# wins over "EXPERIENCE", and the lookbehind leaves back-to-back headers matchable
+# (RE2 has no lookbehind, so this one is compiled with re directly)
+SECTION_HEADER_PATTERN = re.compile(
+    r'(?<=[^\n])(' + '|'.join(map(re.escape, sorted(SECTION_HEADERS, key=len, reverse=True))) + r')'
+)
+DASH_TABLE = str.maketrans({'–': '-', '—': '-'})
+DATE_RANGE_PATTERN = compile_linear(r'(\b(?:19|20)\d{2}\s*(?:-|–|to)\s*(?:19|20)\d{2}|Present|Current)\b')
+
+# Section identifiers with variations, scanned in one pass; the named group is the section
+RESUME_SECTION_PATTERN = compile_linear(
+    r'(?i)(?P<education>\b(?:EDUCATION|ACADEMIC|DEGREE|UNIVERSITY|SCHOOL)\b)'
+    r'|(?P<experience>\b(?:EXPERIENCE|EMPLOYMENT|WORK|PROFESSIONAL|HISTORY|CAREER)\b)'
+    r'|(?P<skills>\b(?:SKILLS|TECHNOLOGIES|TECHNICAL|COMPETENCIES|PROFICIENCIES)\b)'
+    r'|(?P<certifications>\b(?:CERTIFICATIONS|CERTIFICATES|LICENSES|CREDENTIALS)\b)'
+    r'|(?P<projects>\b(?:PROJECTS|PORTFOLIO|WORKS)\b)'
+)
+
+# First letters of every section keyword; text with none of them (e.g. non-Latin
+# scripts) can't contain a section, and the search stops at the first hit otherwise
+SECTION_TRIGGER_PATTERN = compile_linear(r'(?i)[ACDEHLPSTUW]')
+
+# Shorter text is sent to the extractor as-is rather than split into sections
+MIN_SECTIONED_TEXT_CHARS = 200
+
+# Extraction prompt; CrewAI interpolates {resume} at kickoff, so literal braces must be doubled
+EXTRACTION_TASK_TEMPLATE = (
+    "Extract the following details from the resume content below:\n"
+    "- skills: a categorized list of technical and professional skills\n"
+    "- experience: professional experience with job titles, companies, dates, and key responsibilities\n"
+    "- education: education qualifications with degrees, institutions, and dates\n"
+    "- certifications: certifications with names, issuers, and dates (one per line)\n\n"
+    "Return strict JSON with keys skills, experience, education, certifications. "
+    "Each value must be a string with one entry per line. Do not include any text outside the JSON object.\n\n"
+    "Resume content:\n\n{resume}"
+)
+
+EXTRACTOR_BACKSTORY = (
+    "You are an AI agent specialized in parsing resumes into structured data. "
+    "You identify technical, soft, and domain-specific skills, even when they're embedded within project descriptions or work experience. "
+    "You extract job titles, employer names, dates of employment, and key responsibilities in chronological order. "
+    "You recognize degrees, majors, institutions, graduation dates, GPAs, and honors across different education systems. "
+    "You identify certification names, issuing organizations, dates of obtainment, and credential IDs wherever they appear in the resume. "
+    "You always answer with strict, valid JSON."
+)
+
+# Finished extractions keyed by a digest of the resume text, least recently used first
+EXTRACTION_CACHE_SIZE = 1024
+extraction_cache: "OrderedDict[bytes, Dict]" = OrderedDict()
+
+# Longer payloads are rejected with a 422 before any preprocessing runs
+MAX_RESUME_CHARS = 200_000
+
+def extraction_cache_key(content: str) -> bytes:
+    return hashlib.blake2b(content.encode(), digest_size=16).digest()
+
+def get_cached_extraction(content: str) -> Optional[Dict]:
+    """Return the finished extraction for this exact resume text, if one is cached."""
+    cache_key = extraction_cache_key(content)
+    cached = extraction_cache.get(cache_key)
+    if cached is not None:
+        extraction_cache.move_to_end(cache_key)
+    return cached
 
 class ResumeContent(BaseModel):
-    content: str
+    content: str = Field(max_length=MAX_RESUME_CHARS)
+
+@app.on_event("startup")
+async def raise_thread_pool_limits():
+    config.configure_thread_pools()
+
+@app.on_event("shutdown")
+async def close_llm_clients():
+    await llm.aclose()
 
 def preprocess_text(text):
     """
     Preprocess the text from PDF conversion to make it more suitable for extraction
     """
     # Convert multiple spaces to single space
-    text = re.sub(r'\s+', ' ', text)
+    text = WHITESPACE_PATTERN.sub(' ', text)
     
     # Fix common PDF conversion issues with bullet points
+    # (a literal needle, so str.replace rather than a regex)
     text = text.replace('•', '\n• ')
     
     # Make sure there are newlines before common section headers
-    section_headers = [
-        'EDUCATION', 'Education', 'EXPERIENCE', 'Experience', 'SKILLS', 'Skills',
-        'CERTIFICATIONS', 'Certifications', 'PROJECTS', 'Projects',
-        'WORK EXPERIENCE', 'Work Experience', 'PROFESSIONAL EXPERIENCE', 'Professional Experience',
-        'ACADEMIC BACKGROUND', 'Academic Background', 'TECHNICAL SKILLS', 'Technical Skills'
-    ]
-    
-    for header in section_headers:
-        text = re.sub(r'([^\n])(' + header + r')', r'\1\n\n\2', text)
+    text = SECTION_HEADER_PATTERN.sub(r'\n\n\1', text)
     
     # Add spacing after dates (common in experience sections)
-    text = re.sub(r'(\b(19|20)\d{2}\s*(-|–|to)\s*(19|20)\d{2}|Present|Current)\b', r'\1\n', text)
+    text = DATE_RANGE_PATTERN.sub(r'\1\n', text)
     
     # Normalize different dash types
-    text = text.replace('–', '-').replace('—', '-')
+    text = text.translate(DASH_TABLE)
     
     return text
 
-def identify_resume_sections(text):
+def find_resume_sections(text):
     """
-    Try to identify major sections of the resume to help with extraction
+    Locate section headers in the resume, returning (start, end, section_name) spans in text order
     """
-    sections = {}
+    if len(text) < MIN_SECTIONED_TEXT_CHARS or not SECTION_TRIGGER_PATTERN.search(text):
+        return []
+
+    # Find the indices of section headers; matches come back already in text order
+    section_indices = [
+        (match.start(), match.lastgroup) for match in RESUME_SECTION_PATTERN.finditer(text)
+    ]
     
-    # Common section identifiers with variations
-    section_patterns = {
-        'education': r'(?i)(EDUCATION|ACADEMIC|DEGREE|UNIVERSITY|SCHOOL)',
-        'experience': r'(?i)(EXPERIENCE|EMPLOYMENT|WORK|PROFESSIONAL|HISTORY|CAREER)',
-        'skills': r'(?i)(SKILLS|TECHNOLOGIES|TECHNICAL|COMPETENCIES|PROFICIENCIES)',
-        'certifications': r'(?i)(CERTIFICATIONS|CERTIFICATES|LICENSES|CREDENTIALS)',
-        'projects': r'(?i)(PROJECTS|PORTFOLIO|WORKS)'
+    # Each section ends where the next one starts, the last at the end of the text
+    end_indices = [start_idx for start_idx, _ in section_indices[1:]] + [len(text)]
+
+    return [
+        (start_idx, end_idx, section_name)
+        for (start_idx, section_name), end_idx in zip(section_indices, end_indices)
+    ]
+
+def field_to_text(value):
+    """
+    Normalize an extracted JSON field to the newline-separated string format used downstream
+    """
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return "\n".join(field_to_text(item) for item in value)
+    if isinstance(value, dict):
+        return ", ".join(f"{key}: {field_to_text(item)}" for key, item in value.items())
+    return str(value)
+
+def parse_extraction_result(result):
+    """
+    Parse the JSON returned by the resume extraction agent into its four text fields
+    """
+    # Convert CrewOutput to string if necessary
+    raw = result.raw if hasattr(result, 'raw') else str(result)
+
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        # Fall back to the outermost JSON object when the LLM wraps it in extra text
+        match = re.search(r'\{.*\}', raw, re.S)
+        if not match:
+            raise ValueError("Resume extraction did not return JSON")
+        data = json.loads(match.group(0))
+
+    if not isinstance(data, dict):
+        raise ValueError("Resume extraction did not return a JSON object")
+
+    return {
+        key: field_to_text(data.get(key))
+        for key in ("skills", "experience", "education", "certifications")
     }
+
+def prepare_resume_text(content):
+    """
+    Clean the raw PDF text and lay out its identified sections for the extraction prompt
+    """
+    # Preprocess the text from PDF
+    processed_text = preprocess_text(content)
     
-    # Find the indices of section headers
-    section_indices = []
-    for section, pattern in section_patterns.items():
-        matches = re.finditer(pattern, text)
-        for match in matches:
-            section_indices.append((match.start(), section))
-    
-    # Sort by position in text
-    section_indices.sort()
-    
-    # Extract sections based on the indices
-    for i in range(len(section_indices)):
-        start_idx = section_indices[i][0]
-        section_name = section_indices[i][1]
-        
-        # End index is either the start of the next section or the end of the text
-        end_idx = section_indices[i+1][0] if i < len(section_indices) - 1 else len(text)
-        
-        # Extract this section's content
-        section_content = text[start_idx:end_idx].strip()
-        
-        # Add to our sections dictionary, appending if section already exists
-        if section_name in sections:
-            sections[section_name] += "\n" + section_content
+    # Try to identify resume sections to provide better context
+    spans = find_resume_sections(processed_text)
+    if not spans:
+        return processed_text
+
+    # Label the sections in place: every part of the text is sent exactly once and in
+    # its original order, including the name/contact/summary preamble before the first header
+    parts = []
+    preamble = processed_text[:spans[0][0]].strip()
+    if preamble:
+        parts.append(preamble)
+
+    # Keyword hits inside a section (e.g. "university" under education) don't start a new one
+    merged = []
+    for start_idx, end_idx, section_name in spans:
+        if merged and merged[-1][2] == section_name:
+            merged[-1][1] = end_idx
         else:
-            sections[section_name] = section_content
-    
-    return sections
+            merged.append([start_idx, end_idx, section_name])
+
+    for start_idx, end_idx, section_name in merged:
+        parts.append(f"[{section_name.upper()}]\n{processed_text[start_idx:end_idx].strip()}")
+
+    return "\n\n".join(parts)
+
+def build_extraction_response(raw_extraction_result):
+    """
+    Split the extraction agent's JSON into fields and derive the summary counts
+    """
+    extraction_result = parse_extraction_result(raw_extraction_result)
+    skill_extraction_result = extraction_result["skills"]
+    experience_extraction_result = extraction_result["experience"]
+    education_extraction_result = extraction_result["education"]
+    certification_extraction_result = extraction_result["certifications"]
+
+    # Calculate number of years of experience
+    years_of_experience = 0
+    if isinstance(experience_extraction_result, str):
+        # Look for patterns like "X years", "2.5 years", "3+ yrs" or date ranges
+        years_of_experience = sum(map(int, YEARS_PATTERN.findall(experience_extraction_result)))
+        
+        # If no explicit year mentions, try to calculate from date ranges
+        if years_of_experience == 0:
+            date_ranges = EMPLOYMENT_RANGE_PATTERN.findall(experience_extraction_result)
+            current_year = date.today().year
+            for start, end in date_ranges:
+                end_year = current_year if end.lower() in ['present', 'current'] else int(end)
+                years_of_experience += (end_year - int(start))
+
+    # Count the number of certifications
+    num_certifications = 0
+    if isinstance(certification_extraction_result, str):
+        # Count lines or certification mentions
+        num_certifications = sum(1 for line in certification_extraction_result.splitlines() if line.strip())
+
+    # Combine the results into a single response
+    return {
+        "skills": skill_extraction_result,
+        "experience": experience_extraction_result,
+        "education": education_extraction_result,
+        "certifications": certification_extraction_result,
+        "years_of_experience": years_of_experience,
+        "num_certifications": num_certifications
+    }
 
 @app.post("/details/")
 async def extract_details(resume_content: ResumeContent):
+    # Identical resumes are answered without another LLM call
+    cached = get_cached_extraction(resume_content.content)
+    if cached is not None:
+        return cached
+    cache_key = extraction_cache_key(resume_content.content)
+
     try:
-        # Preprocess the text from PDF
-        processed_text = preprocess_text(resume_content.content)
+        # Regex-heavy preprocessing runs in a worker thread to keep the event loop free
+        resume_text = await asyncio.to_thread(prepare_resume_text, resume_content.content)
         
-        # Try to identify resume sections to provide better context
-        sections = identify_resume_sections(processed_text)
-        
-        # Define agents with improved prompts
-        skill_extraction_agent = Agent(
-            role="skill-extraction",
-            goal="Extract a comprehensive list of skills from the provided resume content.",
-            backstory=(
-                "You are an AI agent specialized in identifying and extracting technical, soft, and domain-specific skills from resumes. "
-                "You understand industry jargon, technical terms, and can recognize skills even when they're embedded within project descriptions or work experience. "
-                "You categorize skills into technical (programming languages, tools, platforms), soft skills (communication, leadership), "
-                "and domain-specific knowledge areas."
-            ),
-            verbose=False,
-            allow_delegation=False
-        )
- 
-        experience_extraction_agent = Agent(
-            role="experience-extraction",
-            goal="Extract detailed professional experience from the provided resume content.",
-            backstory=(
-                "You are an AI agent trained to understand and extract professional experience from resumes. "
-                "You can identify job titles, employer names, dates of employment, and key responsibilities. "
-                "You understand how to parse various formats of experience listings and can extract relevant details "
-                "even when the information is presented in different styles or formats. You maintain the chronological "
-                "order and structure of the experience, and you can calculate total years of experience."
-            ),
+        # A single agent extracts every field in one LLM call, so the resume
+        # is only sent (and prefilled) once per request
+        resume_extraction_agent = Agent(
+            role="resume-extractor",
+            goal="Extract skills, professional experience, education and certifications from the provided resume content in a single structured response.",
+            backstory=EXTRACTOR_BACKSTORY,
+            # A fresh chat model per Agent: CrewAI appends a token-counting callback to
+            # the model on every Agent it builds. The model reuses the shared HTTP clients
+            llm=llm.get_chat_model(),
             verbose=False,
             allow_delegation=False
         )
- 
-        education_extraction_agent = Agent(
-            role="education-extraction",
-            goal="Extract comprehensive education qualifications from the provided resume content.",
-            backstory=(
-                "You are an AI agent specialized in extracting education information from resumes. "
-                "You can identify degrees, majors, minors, institutions, graduation dates, GPAs, honors, and relevant coursework. "
-                "You understand different education systems globally and can normalize different formats to extract consistent information. "
-                "You present education in a structured and chronological order."
-            ),
-            verbose=False,
-            allow_delegation=False
-        )
- 
-        certification_extraction_agent = Agent(
-            role="certification-extraction",
-            goal="Extract complete certification information from the provided resume content.",
-            backstory=(
-                "You are an AI agent trained to identify and extract professional certifications from resumes. "
-                "You can recognize certification names, issuing organizations, dates of obtainment, expiration dates, and credential IDs. "
-                "You understand industry-specific certifications across various fields and can extract them accurately "
-                "even when they're mentioned in different sections of the resume or in different formats."
-            ),
-            verbose=False,
-            allow_delegation=False
-        )
- 
-        # Enhance task descriptions using identified sections
-        skill_task_description = f"Extract skills from the following resume content, focusing especially on technical and professional skills. If available, pay special attention to the skills section:\n\n{sections.get('skills', processed_text)}"
-        
-        experience_task_description = f"Extract professional experience details, including job titles, companies, dates, and responsibilities. If available, focus on the experience section:\n\n{sections.get('experience', processed_text)}"
-        
-        education_task_description = f"Extract education qualifications, including degrees, institutions, and dates. If available, focus on the education section:\n\n{sections.get('education', processed_text)}"
-        
-        certification_task_description = f"Extract certifications, including names, issuers, and dates. If available, focus on the certifications section:\n\n{sections.get('certifications', processed_text)}"
-        
-        # Define tasks with enhanced descriptions
-        skill_extraction_task = Task(
-            description=skill_task_description,
-            agent=skill_extraction_agent,
-            expected_output="A structured, categorized list of skills extracted from the resume content."
-        )
- 
-        experience_extraction_task = Task(
-            description=experience_task_description,
-            agent=experience_extraction_agent,
-            expected_output="A chronological list of professional experiences with company names, job titles, dates, and key responsibilities."
-        )
- 
-        education_extraction_task = Task(
-            description=education_task_description,
-            agent=education_extraction_agent,
-            expected_output="A list of education qualifications with institutions, degrees, dates, and relevant details."
-        )
- 
-        certification_extraction_task = Task(
-            description=certification_task_description,
-            agent=certification_extraction_agent,
-            expected_output="A list of certifications with names, issuing organizations, and dates."
-        )
- 
-        # Define crews for each type of extraction
-        skill_extraction_crew = Crew(
-            agents=[skill_extraction_agent],
-            tasks=[skill_extraction_task],
-            verbose=0,
-            process=Process.sequential
-        )
- 
-        experience_extraction_crew = Crew(
-            agents=[experience_extraction_agent],
-            tasks=[experience_extraction_task],
-            verbose=0,
-            process=Process.sequential
+
+        resume_extraction_task = Task(
+            description=EXTRACTION_TASK_TEMPLATE,
+            agent=resume_extraction_agent,
+            expected_output="Return strict JSON with keys skills, experience, education, certifications"
         )
- 
-        education_extraction_crew = Crew(
-            agents=[education_extraction_agent],
-            tasks=[education_extraction_task],
+
+        resume_extraction_crew = Crew(
+            agents=[resume_extraction_agent],
+            tasks=[resume_extraction_task],
             verbose=0,
             process=Process.sequential
         )
- 
-        certification_extraction_crew = Crew(
-            agents=[certification_extraction_agent],
-            tasks=[certification_extraction_task],
-            verbose=0,
-            process=Process.sequential
+
+        # Execute the crew off the event loop (CrewAI fills {resume} into the task template)
+        raw_extraction_result = await asyncio.to_thread(
+            llm.kickoff_with_retry,
+            resume_extraction_crew,
+            inputs={"resume": resume_text}
         )
- 
-        # Execute the crews and get the results
-        skill_extraction_result = skill_extraction_crew.kickoff()
-        experience_extraction_result = experience_extraction_crew.kickoff()
-        education_extraction_result = education_extraction_crew.kickoff()
-        certification_extraction_result = certification_extraction_crew.kickoff()
- 
-        # Convert to strings if necessary
-        if isinstance(skill_extraction_result, list):
-            skill_extraction_result = "\n".join(skill_extraction_result)
-       
-        if isinstance(experience_extraction_result, list):
-            experience_extraction_result = "\n".join(experience_extraction_result)
-       
-        if isinstance(education_extraction_result, list):
-            education_extraction_result = "\n".join(education_extraction_result)
-       
-        if isinstance(certification_extraction_result, list):
-            certification_extraction_result = "\n".join(certification_extraction_result)
- 
-        # Calculate number of years of experience
-        years_of_experience = 0
-        if isinstance(experience_extraction_result, str):
-            # Look for patterns like "X years" or date ranges
-            year_patterns = re.findall(r'(\d+)\s*(?:years?|yrs?)', experience_extraction_result, re.IGNORECASE)
-            for year_str in year_patterns:
-                if year_str.isdigit():
-                    years_of_experience += int(year_str)
-            
-            # If no explicit year mentions, try to calculate from date ranges
-            if years_of_experience == 0:
-                date_ranges = re.findall(r'(\d{4})\s*-\s*(\d{4}|Present|Current)', experience_extraction_result)
-                current_year = 2025  # Assuming current year
-                for start, end in date_ranges:
-                    end_year = current_year if end.lower() in ['present', 'current'] else int(end)
-                    years_of_experience += (end_year - int(start))
- 
-        # Count the number of certifications
-        num_certifications = 0
-        if isinstance(certification_extraction_result, str):
-            # Count lines or certification mentions
-            cert_lines = [line for line in certification_extraction_result.split('\n') if line.strip()]
-            num_certifications = len(cert_lines)
- 
-        # Combine the results into a single response
-        result = {
-            "skills": skill_extraction_result,
-            "experience": experience_extraction_result,
-            "education": education_extraction_result,
-            "certifications": certification_extraction_result,
-            "years_of_experience": years_of_experience,
-            "num_certifications": num_certifications
-        }
- 
-        return result
+
+        # Parse the JSON and count years/certifications off the event loop as well
+        result = await asyncio.to_thread(build_extraction_response, raw_extraction_result)
  
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
+
+    extraction_cache[cache_key] = result
+    if len(extraction_cache) > EXTRACTION_CACHE_SIZE:
+        extraction_cache.popitem(last=False)
+    return result
     
 if __name__ == "__main__":
-    uvicorn.run("resume_parser:app", host="127.0.0.1", port=8001, reload=True)
\ No newline at end of file
+    if os.getenv("ENV") == "dev":
+        uvicorn.run("resume_parser:app", host="127.0.0.1", port=8001, reload=True)
+    else:
+        # Production: no file watcher, one worker per core unless WEB_CONCURRENCY says
+        # otherwise, C event loop and HTTP parser
+        uvicorn.run(
+            "resume_parser:app",
+            host="0.0.0.0",
+            port=8001,
+            workers=int(os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1),
+            loop="uvloop",
+            http="httptools"
+        )
@@ -0,0 +1,266 @@
+# semantic_cache.py
+import os
+import re
+import hashlib
+import threading
+from collections import deque
+from typing import Deque, Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+import llm
+
+def embed_text(model: str, text: str) -> np.ndarray:
+    """Embed text with the configured endpoint as a unit-length vector."""
+    response = llm.sync_client.embeddings.create(model=model, input=text)
+    vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class SemanticCache:
+    """
+    Cache of evaluation ratings keyed on answer similarity within a scope.
+
+    A scope is one question as asked by one evaluator setup (role and
+    experience level), since the same answer can earn a different rating
+    elsewhere. Exact repeats are served from a sha256-keyed dict without any
+    API call; otherwise the answer alone is embedded and compared against the
+    answers stored for that scope, returning the cached rating when cosine
+    similarity reaches the threshold.
+    """
+
+    REDIS_EXACT_KEY = "semantic_cache:v2:exact"
+    REDIS_VECTORS_KEY = "semantic_cache:v2:vectors"
+
+    def __init__(self, threshold: float = 0.92, model: str = None, redis_url: str = None):
+        """
+        Args:
+            threshold: Minimum cosine similarity between answers for a semantic hit
+            model: Embedding model name (defaults to EMBEDDING_MODEL_NAME or text-embedding-3-small)
+            redis_url: Optional Redis URL used to persist and share cache entries
+        """
+        self.threshold = threshold
+        self.model = model or os.getenv("EMBEDDING_MODEL_NAME", "text-embedding-3-small")
+
+        self._exact: Dict[str, int] = {}
+        # scope key -> (answer matrix, exact keys, ratings)
+        self._scopes: Dict[str, Tuple[np.ndarray, List[str], List[int]]] = {}
+        self._lock = threading.Lock()
+
+        # Disabled after the first embedding failure (e.g. the endpoint has no embeddings API)
+        self._embeddings_enabled = True
+
+        self._redis = None
+        if redis_url:
+            import redis
+            self._redis = redis.Redis.from_url(redis_url)
+            self._load_from_redis()
+
+    @staticmethod
+    def _scope_key(question: str, scope: str) -> str:
+        """Generate the key shared by every answer to a question within a scope."""
+        return hashlib.sha256(f"{scope}\0{question}".encode()).hexdigest()
+
+    @staticmethod
+    def _exact_key(scope_key: str, answer: str) -> str:
+        """Generate the exact-match key for an answer within a scope."""
+        return hashlib.sha256(f"{scope_key}\0{answer}".encode()).hexdigest()
+
+    def _embed(self, answer: str) -> Optional[np.ndarray]:
+        """Embed an answer as a unit-length vector, or None if embeddings are unavailable."""
+        if not self._embeddings_enabled:
+            return None
+
+        try:
+            return embed_text(self.model, answer)
+        except Exception as e:
+            print(f"Warning: Disabling semantic cache lookups, embedding failed: {e}")
+            self._embeddings_enabled = False
+            return None
+
+    def lookup(self, question: str, answer: str, scope: str = "") -> Tuple[Optional[int], Optional[np.ndarray]]:
+        """
+        Look up a cached rating for an answer to a question.
+
+        Args:
+            scope: Evaluation setup the rating applies to (e.g. role and experience level)
+
+        Returns:
+            Tuple of (cached rating or None, embedding of the answer or None).
+            Pass the embedding back to insert() on a miss to avoid re-embedding.
+        """
+        scope_key = self._scope_key(question, scope)
+        rating = self._exact.get(self._exact_key(scope_key, answer))
+        if rating is not None:
+            return rating, None
+
+        vector = self._embed(answer)
+        if vector is None:
+            return None, None
+
+        with self._lock:
+            matrix, _, ratings = self._scopes.get(scope_key, (None, [], []))
+
+        if ratings and matrix.shape[1] == vector.shape[0]:
+            similarities = matrix @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                return ratings[best], vector
+
+        return None, vector
+
+    def insert(self, question: str, answer: str, rating: int, embedding: Optional[np.ndarray] = None,
+               scope: str = "") -> None:
+        """Store a rating for an answer to a question within a scope."""
+        scope_key = self._scope_key(question, scope)
+        exact_key = self._exact_key(scope_key, answer)
+        if embedding is None:
+            embedding = self._embed(answer)
+
+        self._add(scope_key, exact_key, rating, embedding)
+
+        if self._redis is not None:
+            try:
+                self._redis.hset(self.REDIS_EXACT_KEY, exact_key, rating)
+                if embedding is not None:
+                    self._redis.hset(self.REDIS_VECTORS_KEY, f"{scope_key}:{exact_key}",
+                                     embedding.astype(np.float32).tobytes())
+            except Exception as e:
+                print(f"Warning: Failed to save semantic cache entry to Redis: {e}")
+
+    def _add(self, scope_key: str, exact_key: str, rating: int, embedding: Optional[np.ndarray]) -> None:
+        with self._lock:
+            self._exact[exact_key] = rating
+            if embedding is None:
+                return
+            matrix, keys, ratings = self._scopes.get(scope_key, (None, [], []))
+            if exact_key in keys:
+                return
+            if matrix is not None and matrix.shape[1] != embedding.shape[0]:
+                return
+
+            # Copy-on-write so concurrent lookups keep a consistent snapshot
+            matrix = embedding[np.newaxis, :] if matrix is None else np.vstack([matrix, embedding])
+            self._scopes[scope_key] = (matrix, keys + [exact_key], ratings + [rating])
+
+    def _load_from_redis(self) -> None:
+        """Populate the in-process index from Redis."""
+        try:
+            ratings = self._redis.hgetall(self.REDIS_EXACT_KEY)
+            vectors = self._redis.hgetall(self.REDIS_VECTORS_KEY)
+        except Exception as e:
+            print(f"Warning: Failed to load semantic cache from Redis: {e}")
+            return
+
+        with self._lock:
+            for raw_key, raw_rating in ratings.items():
+                self._exact[raw_key.decode()] = int(raw_rating)
+
+        for raw_field, raw_vector in vectors.items():
+            scope_key, exact_key = raw_field.decode().split(":", 1)
+            rating = self._exact.get(exact_key)
+            if rating is not None:
+                self._add(scope_key, exact_key, rating, np.frombuffer(raw_vector, dtype=np.float32))
+
+RESUME_WORD_PATTERN = re.compile(r"\w+")
+
+def resume_shingles(text: str, size: int = 5) -> FrozenSet[Tuple[str, ...]]:
+    """Return the set of overlapping word n-grams of the lowercased text."""
+    words = RESUME_WORD_PATTERN.findall(text.lower())
+    if len(words) <= size:
+        return frozenset([tuple(words)]) if words else frozenset()
+    return frozenset(tuple(words[i:i + size]) for i in range(len(words) - size + 1))
+
+class QuestionSetCache:
+    """
+    Cache of generated interview questions keyed on near-identical resume text.
+
+    Questions are tailored to one candidate, so a set is only reused when the
+    full resume text for the same role is almost unchanged: the Jaccard
+    similarity of its word 5-gram sets must reach the threshold. That catches
+    re-exports and small edits but not a different candidate with a similar
+    profile, which embeddings of the extracted summary could not tell apart.
+    """
+
+    def __init__(self, threshold: float = 0.9, max_entries_per_role: int = 256):
+        """
+        Args:
+            threshold: Minimum Jaccard similarity between resume shingle sets for a hit
+            max_entries_per_role: Resumes kept per role, oldest evicted first
+        """
+        self.threshold = threshold
+        self._roles: Dict[str, Deque[Tuple[FrozenSet[Tuple[str, ...]], List[str]]]] = {}
+        self._max_entries_per_role = max_entries_per_role
+        self._lock = threading.Lock()
+
+    def lookup(self, role: str, resume: str) -> Optional[List[str]]:
+        """Look up questions generated for a near-identical resume and the same role."""
+        shingles = resume_shingles(resume)
+        if not shingles:
+            return None
+
+        with self._lock:
+            entries = list(self._roles.get(role.strip().lower(), ()))
+
+        size = len(shingles)
+        for cached_shingles, questions in reversed(entries):
+            cached_size = len(cached_shingles)
+            # Jaccard can't reach the threshold when the set sizes differ too much
+            if min(size, cached_size) < self.threshold * max(size, cached_size):
+                continue
+            overlap = len(shingles & cached_shingles)
+            if overlap >= self.threshold * (size + cached_size - overlap):
+                return questions
+
+        return None
+
+    def insert(self, role: str, resume: str, questions: List[str]) -> None:
+        """Store the questions generated for a resume and role."""
+        shingles = resume_shingles(resume)
+        if not shingles:
+            return
+
+        key = role.strip().lower()
+        with self._lock:
+            entries = self._roles.get(key)
+            if entries is None:
+                entries = self._roles[key] = deque(maxlen=self._max_entries_per_role)
+            entries.append((shingles, questions))
+
+_default_cache: Optional[SemanticCache] = None
+_default_question_cache: Optional[QuestionSetCache] = None
+
+def get_default_cache() -> Optional[SemanticCache]:
+    """
+    Return the process-wide semantic cache, configured from the environment.
+
+    Set SEMANTIC_CACHE=0 to disable it, SEMANTIC_CACHE_THRESHOLD to tune the
+    similarity cutoff and REDIS_URL to back it with Redis.
+    """
+    global _default_cache
+    if os.getenv("SEMANTIC_CACHE", "1") == "0":
+        return None
+
+    if _default_cache is None:
+        _default_cache = SemanticCache(
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+            redis_url=os.getenv("REDIS_URL")
+        )
+    return _default_cache
+
+def get_default_question_cache() -> Optional[QuestionSetCache]:
+    """
+    Return the process-wide question set cache, configured from the environment.
+
+    Disabled along with the evaluation cache by SEMANTIC_CACHE=0;
+    QUESTION_CACHE_THRESHOLD sets the minimum Jaccard similarity of the
+    resume texts' word 5-gram sets (default 0.9).
+    """
+    global _default_question_cache
+    if os.getenv("SEMANTIC_CACHE", "1") == "0":
+        return None
+
+    if _default_question_cache is None:
+        _default_question_cache = QuestionSetCache(
+            threshold=float(os.getenv("QUESTION_CACHE_THRESHOLD", "0.9"))
+        )
+    return _default_question_cache